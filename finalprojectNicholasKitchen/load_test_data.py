@@ -11,6 +11,8 @@ django.setup()
 
 from django.contrib.auth.models import User
 from zooventory.models import UniqueAnimal, MyAnimal, Food, FeedingSchedule, Log
+from zooventory.inventory import seed_burn_rates
+from zooventory.rollups import rebuild_feeding_rollups
 
 # -----------------------------
 # Helper Functions
@@ -181,4 +183,14 @@ for day in range(days_back):
             # Force timestamp
             Log.objects.filter(id=log.id).update(created_at=day_timestamp.replace(hour=12))
 
+# -----------------------------
+# Rebuild Rollups and Forecasts
+# -----------------------------
+# The logs above were back-dated after they were written, so rebuild the daily feeding rollups
+# the charts read and the food burn rates from them
+backfilled, written = rebuild_feeding_rollups([user.id])
+seed_burn_rates([user.id])
+
+print(f"Rebuilt {written} daily feeding rollups.")
+
 print("Done! Seed data for 60 days has been added.")
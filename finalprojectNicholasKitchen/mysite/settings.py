@@ -86,6 +86,24 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared by the web workers and the scheduler process. Use Redis or Memcached when running on more than one host.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+UNREAD_NOTIFICATIONS_CACHE_SECONDS = 300  # Safety expiry for the cached navbar notifications
+CHART_CACHE_SECONDS = 3600  # How long a computed chart payload is kept for reuse
+CHART_MAX_POINTS = 400  # Line charts over longer ranges are downsampled to this many points
+CHART_MAX_TOP = 50  # Largest n accepted by the ranked charts
+NOTIFICATION_STREAM_KEEPALIVE_SECONDS = 15  # Idle time before a keepalive comment is sent on a notification stream
+NOTIFICATION_STREAM_POLL_SECONDS = 2  # How often a stream checks the cache for notifications written by another process
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -134,4 +152,39 @@ LOGIN_URL = 'login'
 
 # Load API Key
 load_dotenv()
-API_NINJAS_KEY = os.getenv('API_NINJAS_KEY')
\ No newline at end of file
+API_NINJAS_KEY = os.getenv('API_NINJAS_KEY')
+
+# Feeding schedule scheduler
+SCHEDULER_BATCH_SIZE = 500  # Schedules handled per transaction
+SCHEDULER_WORKERS = 1  # Threads handling partitions in parallel. Ignored on SQLite, which only allows one writer.
+SCHEDULER_RECONCILE_MINUTES = 15  # How often the timer is reloaded from the database
+SCHEDULER_LEASE_SECONDS = 30  # Leader lease length, renewed every third of it
+SCHEDULER_METRICS_WINDOW = 500  # Recent checks kept for scheduler_stats
+
+# Start the scheduler in web server processes. Set SCHEDULER_AUTOSTART=false when running manage.py run_scheduler instead.
+SCHEDULER_AUTOSTART = os.getenv('SCHEDULER_AUTOSTART', 'true').lower() == 'true'
+
+# Notification retention, run by the scheduler leader
+NOTIFICATION_RETENTION_HOURS = 24  # How often the retention job runs
+NOTIFICATION_RETENTION_DAYS = 90  # Read notifications older than this are deleted
+NOTIFICATION_MAX_READ_PER_USER = 500  # Newest read notifications kept per user
+NOTIFICATION_RETENTION_CHUNK = 1000  # Rows deleted per transaction
+NOTIFICATION_ARCHIVE_DIR = os.getenv('NOTIFICATION_ARCHIVE_DIR')  # Write deleted notifications to gzipped per-user files here first
+
+# Food stock forecasts
+FOOD_BURN_RATE_WINDOW_DAYS = 14  # Time constant of the moving average of daily use
+FOOD_LOW_STOCK_DAYS = 7  # Alert when a food is forecast to run out within this many days
+FOOD_LOW_STOCK_CHECK_MINUTES = 15  # How often the scheduler leader looks for low stock
+FOOD_STOCK_RETRIES = 5  # Tries at taking stock while other feedings keep moving the burn rate
+
+# Weigh-in imports
+IMPORT_CHUNK_SIZE = 500  # Rows validated and written per transaction
+IMPORT_MAX_ERRORS = 100  # Row errors listed after an import, the rest are only counted
+
+# Log exports
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched from the database and written out at a time
+
+# Log archival, run by the scheduler leader
+LOG_ARCHIVE_HOURS = 24  # How often the archive job runs
+LOG_ARCHIVE_AFTER_DAYS = 365  # Logs from before this many local days ago move to the archive table
+LOG_ARCHIVE_CHUNK = 1000  # Rows moved per transaction
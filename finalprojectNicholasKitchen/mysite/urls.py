@@ -20,5 +20,6 @@ from django.urls import path, include
 urlpatterns = [
     path('accounts/', include('django.contrib.auth.urls')),
     path('', include('zooventory.urls')),
+    path('scheduler/', include('scheduler.urls')),
     path('admin/', admin.site.urls),
 ]
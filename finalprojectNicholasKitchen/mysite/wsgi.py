@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
 application = get_wsgi_application()
+
+# Run the feeding scheduler inside the web server unless it runs on its own with manage.py run_scheduler
+from django.conf import settings
+from scheduler.jobs import start_scheduler
+
+if settings.SCHEDULER_AUTOSTART:
+    start_scheduler()
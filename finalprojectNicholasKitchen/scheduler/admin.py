@@ -1,3 +1,15 @@
 from django.contrib import admin
+from .models import SchedulerLease
 
-# Register your models here.
+
+@admin.register(SchedulerLease)
+class SchedulerLeaseAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'holder', 'expires_at')
+    ordering = ('name',)
+
+    # Leases are managed by the scheduler
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -5,7 +5,7 @@ class SchedulerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'scheduler'
 
-    # Start the scheduler on startup
+    # Connect the timer signals. The scheduler itself is started by the web server
+    # entry points (mysite/wsgi.py, mysite/asgi.py) or by manage.py run_scheduler.
     def ready(self):
-        from .jobs import start_scheduler
-        start_scheduler()
\ No newline at end of file
+        from . import signals
\ No newline at end of file
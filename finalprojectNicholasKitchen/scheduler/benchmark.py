@@ -0,0 +1,165 @@
+import heapq
+import random
+import time
+
+from contextlib import contextmanager
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import datetime, time as time_of_day, timedelta
+from unittest import mock
+from zooventory.models import MyAnimal, FeedingSchedule, Notification
+from .jobs import calculate_next_run, check_feeding_schedules
+from .recurrence import WEEKDAYS, first_occurrence
+
+# -----------------------------
+# Virtual clock
+# -----------------------------
+
+# Clock that only moves when the simulation moves it
+class VirtualClock:
+    def __init__(self, start):
+        self.current = start
+
+    def now(self):
+        return self.current
+
+# Replace timezone.now everywhere (jobs, recurrence, auto_now_add fields) while the block runs
+@contextmanager
+def frozen_at(clock):
+    with mock.patch('django.utils.timezone.now', clock.now):
+        yield
+
+# -----------------------------
+# Synthetic population
+# -----------------------------
+
+# Create owners, animals and a mix of daily, weekly and every-X-hours schedules
+def seed_population(animals, rng, now, animals_per_owner=20):
+    User = get_user_model()
+    owners = User.objects.bulk_create([
+        User(username=f'bench_{i}') for i in range((animals - 1) // animals_per_owner + 1)
+    ])
+    myanimals = MyAnimal.objects.bulk_create([
+        MyAnimal(owner=owners[i // animals_per_owner], name=f'Animal {i}', species='Benchmark')
+        for i in range(animals)
+    ])
+
+    schedules = []
+    for myanimal in myanimals:
+        roll = rng.random()
+        if roll < 0.5:
+            schedule = FeedingSchedule(myanimal=myanimal, frequency=FeedingSchedule.DAILY,
+                                       time_of_day=time_of_day(rng.randrange(24), rng.choice([0, 15, 30, 45])))
+        elif roll < 0.75:
+            schedule = FeedingSchedule(myanimal=myanimal, frequency=FeedingSchedule.WEEKLY, day_of_week=rng.choice(WEEKDAYS),
+                                       time_of_day=time_of_day(rng.randrange(24), rng.choice([0, 15, 30, 45])))
+        else:
+            schedule = FeedingSchedule(myanimal=myanimal, frequency=FeedingSchedule.EVERY_X_HOURS, hours_interval=rng.randint(1, 12))
+        schedule.next_run = first_occurrence(schedule, now)
+        schedules.append(schedule)
+
+    return FeedingSchedule.objects.bulk_create(schedules)
+
+# -----------------------------
+# Reference calculation
+# -----------------------------
+
+# Step a schedule forward by exactly one occurrence, the slow and obvious way
+def reference_step(schedule, run):
+    if schedule.frequency == FeedingSchedule.EVERY_X_HOURS:
+        return run + timedelta(hours=schedule.hours_interval)
+
+    days = 7 if schedule.frequency == FeedingSchedule.WEEKLY else 1
+    run_date = timezone.localtime(run).date() + timedelta(days=days)
+    return timezone.make_aware(datetime.combine(run_date, schedule.time_of_day))
+
+# -----------------------------
+# Simulation
+# -----------------------------
+
+# Run the scheduler over a simulated period and compare every fired schedule against the reference.
+# In 'poll' mode the clock moves one tick at a time like the old one-minute job, in 'timer' mode it
+# jumps straight to the next due run like the event-driven timer.
+def simulate(animals=1000, days=7, tick_minutes=1, mode='poll', seed=0, on_tick=None):
+    rng = random.Random(seed)
+    start = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=timezone.localdate().weekday()), time_of_day(0)))
+    end = start + timedelta(days=days)
+    clock = VirtualClock(start)
+
+    with frozen_at(clock):
+        schedules = {schedule.id: schedule for schedule in seed_population(animals, rng, start)}
+
+    # Reference next runs, plus a heap to find the earliest one
+    reference = {schedule_id: schedule.next_run for schedule_id, schedule in schedules.items()}
+    upcoming = [(next_run, schedule_id) for schedule_id, next_run in reference.items()]
+    heapq.heapify(upcoming)
+
+    results = {
+        'ticks': 0, 'active_ticks': 0, 'queries': 0, 'max_queries': 0, 'wall_seconds': 0.0, 'max_wall_seconds': 0.0,
+        'notifications': 0, 'expected_notifications': 0, 'mismatched_ticks': 0, 'drifted': 0, 'max_drift_seconds': 0.0,
+    }
+
+    while True:
+        # Move the clock to the next tick, or straight to the next due run
+        if mode == 'timer':
+            if not upcoming or upcoming[0][0] > end:
+                break
+            clock.current = max(clock.current, upcoming[0][0])
+        else:
+            clock.current += timedelta(minutes=tick_minutes)
+            if clock.current > end:
+                break
+
+        # Work out what the reference says fires on this tick, coalescing missed runs into one notification
+        fired = []
+        while upcoming and upcoming[0][0] <= clock.current:
+            next_run, schedule_id = heapq.heappop(upcoming)
+            while next_run <= clock.current:
+                next_run = reference_step(schedules[schedule_id], next_run)
+            reference[schedule_id] = next_run
+            heapq.heappush(upcoming, (next_run, schedule_id))
+            fired.append(schedule_id)
+
+        # Run the real check against the virtual clock
+        with frozen_at(clock), CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            processed = check_feeding_schedules()
+            wall = time.perf_counter() - started
+
+        # Compare the stored next runs with the reference (not counted against the tick)
+        drift = [
+            abs((next_run - reference[schedule_id]).total_seconds())
+            for schedule_id, next_run in FeedingSchedule.objects.filter(id__in=fired).values_list('id', 'next_run')
+        ]
+        drifted = sum(1 for seconds in drift if seconds)
+
+        results['ticks'] += 1
+        results['active_ticks'] += 1 if processed else 0
+        results['queries'] += len(queries)
+        results['max_queries'] = max(results['max_queries'], len(queries))
+        results['wall_seconds'] += wall
+        results['max_wall_seconds'] = max(results['max_wall_seconds'], wall)
+        results['notifications'] += processed
+        results['expected_notifications'] += len(fired)
+        results['mismatched_ticks'] += 1 if processed != len(fired) else 0
+        results['drifted'] += drifted
+        results['max_drift_seconds'] = max([results['max_drift_seconds'], *drift])
+
+        if on_tick and (processed or fired):
+            on_tick({
+                'at': clock.current, 'queries': len(queries), 'wall_seconds': wall,
+                'notifications': processed, 'expected': len(fired), 'drifted': drifted,
+            })
+
+    results['stored_notifications'] = Notification.objects.count()
+
+    # Time calculate_next_run on its own over the whole population
+    with frozen_at(clock):
+        started = time.perf_counter()
+        for schedule in schedules.values():
+            calculate_next_run(schedule)
+        results['calculate_next_run_us'] = (time.perf_counter() - started) / len(schedules) * 1e6
+
+    return results
@@ -1,69 +1,229 @@
+import threading
+import time
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
 from apscheduler.schedulers.background import BackgroundScheduler
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import OuterRef, Q, Subquery
 from django.utils import timezone
-from datetime import datetime, timedelta
 from zooventory.models import FeedingSchedule, Notification
-
-# Function to check all feeding schedules for past times
+from zooventory.events import publish_notifications
+from zooventory.notifications import invalidate_unread
+from zooventory.inventory import notify_low_stock
+from zooventory.archive import archive_logs
+from .retention import purge_notifications
+from .recurrence import advance_all, next_occurrence
+from .signals import schedules_advanced
+from .metrics import QueryCounter, record_check, record_missed_job, record_overlap, snapshot
+from .lease import holds_lease, release_lease, renew_lease, take_reload_request
+from .timer import current_timer, start_timer
+
+# The background scheduler running in this process, if any
+_scheduler = None
+
+# Only one check may run at a time in this process. A check that overruns into the
+# next one makes the next one skip instead of handling the same schedules twice.
+_check_lock = threading.Lock()
+
+# Function to check all feeding schedules for past times.
+# Due schedules are split into disjoint partitions that are handled inline, or by a
+# thread pool when SCHEDULER_WORKERS is above 1 on a database with concurrent writers.
+# Every check is timed and recorded in the scheduler metrics. Returns how many schedules fired.
 def check_feeding_schedules():
-    now = timezone.now()
-
-    # Filter for all schedules with a date less than current time
-    schedules = FeedingSchedule.objects.filter(next_run__lte=now)
-
-    # Send notification for each schedule and recalculate the next run
-    for schedule in schedules:
-        owner = schedule.myanimal.owner
-        animal = schedule.myanimal
-
-        # Create notification
-        Notification.objects.create(owner=owner, message=f"It's time to feed {animal.name}")
-
-        # Recalculate next_run
-        schedule.next_run = calculate_next_run(schedule)
-        schedule.save()
+    if not _check_lock.acquire(blocking=False):
+        record_overlap()
+        return 0
+
+    started_at = timezone.now()
+    started = time.perf_counter()
+    counter = QueryCounter()
+    due = 0
+    lags = []
+    error = None
+
+    try:
+        with connection.execute_wrapper(counter):
+            now = timezone.now()
+
+            # SQLite only allows one writer, so partitions are always handled inline there
+            workers = 1 if connection.vendor == 'sqlite' else settings.SCHEDULER_WORKERS
+            if workers <= 1:
+                for ids in _due_partitions(now):
+                    due += len(ids)
+                    lags += _process_partition(ids, now)
+                return len(lags)
+
+            # Keep a bounded number of partitions in flight so the scan never runs far ahead of the workers
+            pending = deque()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for ids in _due_partitions(now):
+                    due += len(ids)
+                    if len(pending) >= 2 * workers:
+                        lags += pending.popleft().result()
+                    pending.append(pool.submit(_process_partition_in_thread, ids, now, counter))
+                for future in pending:
+                    lags += future.result()
+            return len(lags)
+    except Exception as e:
+        error = repr(e)
+        raise
+    finally:
+        _check_lock.release()
+        record_check(started_at, time.perf_counter() - started, due, len(lags), counter.count, lags, error)
+
+# Helper function to page through due schedule ids with keyset pagination over (next_run, id)
+def _due_partitions(now):
+    last = None
+    while True:
+        due = FeedingSchedule.objects.filter(next_run__lte=now)
+        if last:
+            due = due.filter(Q(next_run__gt=last[0]) | Q(next_run=last[0], id__gt=last[1]))
+
+        page = list(due.order_by('next_run', 'id').values_list('next_run', 'id')[:settings.SCHEDULER_BATCH_SIZE])
+        if not page:
+            return
+
+        yield [schedule_id for next_run, schedule_id in page]
+        last = page[-1]
+
+# Helper function to fire one partition of schedules in its own transaction.
+# Returns how late each fired schedule was, in seconds.
+def _process_partition(ids, now):
+    with transaction.atomic():
+        # Load the animals and any unread reminder for each schedule in the same query,
+        # and skip anything another check already moved past now
+        unread = Notification.objects.filter(schedule=OuterRef('pk'), is_read=False)
+        schedules = (
+            FeedingSchedule.objects.select_related('myanimal')
+            .annotate(unread_id=Subquery(unread.values('id')[:1]), unread_occurrences=Subquery(unread.values('occurrences')[:1]))
+            .filter(id__in=ids, next_run__lte=now)
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            schedules = schedules.select_for_update(skip_locked=True, of=('self',))
+        schedules = list(schedules)
+        if not schedules:
+            return []
+
+        # Fold missed runs and any unread reminder into one notification per schedule, and move next_run past now
+        created = []
+        coalesced = []
+        missed_runs = {}
+        due_runs = [schedule.next_run for schedule in schedules]
+        for schedule, (next_run, missed) in zip(schedules, advance_all(schedules, now)):
+            missed_runs[schedule.id] = missed
+            notification = Notification(
+                owner_id=schedule.myanimal.owner_id,
+                schedule_id=schedule.id,
+                message=f"It's time to feed {schedule.myanimal.name}",
+                occurrences=missed,
+                created_at=timezone.now(),
+            )
+            if schedule.unread_id:
+                notification.id = schedule.unread_id
+                notification.occurrences += schedule.unread_occurrences
+                coalesced.append(notification)
+            else:
+                created.append(notification)
+            schedule.next_run = next_run
+
+        # Reminders marked read since they were loaded can't be folded into, so they get a fresh notification
+        if coalesced:
+            updated = Notification.objects.filter(is_read=False).bulk_update(coalesced, ['message', 'occurrences', 'created_at'])
+            if updated < len(coalesced):
+                read_ids = set(Notification.objects.filter(id__in=[n.id for n in coalesced], is_read=True).values_list('id', flat=True))
+                for notification in coalesced:
+                    if notification.id in read_ids:
+                        notification.id = None
+                        notification.occurrences = missed_runs[notification.schedule_id]
+                        created.append(notification)
+                coalesced = [notification for notification in coalesced if notification.id is not None]
+
+        # Write the rest of the partition with one insert and one update
+        lags = [(timezone.now() - run).total_seconds() for run in due_runs]
+        Notification.objects.bulk_create(created)
+        FeedingSchedule.objects.bulk_update(schedules, ['next_run'])
+
+        # Once committed, let the timer know about the new runs and drop the owners' cached unread summaries
+        runs = [(schedule.id, schedule.next_run) for schedule in schedules]
+        transaction.on_commit(lambda: schedules_advanced.send(sender=FeedingSchedule, runs=runs))
+        transaction.on_commit(lambda: invalidate_unread(schedule.myanimal.owner_id for schedule in schedules))
+        transaction.on_commit(lambda: publish_notifications(created + coalesced))
+
+    return lags
+
+# Pool threads get their own database connection, so count its queries and close it when the partition is done
+def _process_partition_in_thread(ids, now, counter):
+    try:
+        with connection.execute_wrapper(counter):
+            return _process_partition(ids, now)
+    finally:
+        connection.close()
 
 # Helper function to calculate next run for feeding schedule
-def calculate_next_run(schedule):
-    now = timezone.now()
-
-    # For Every X Hours
-    if schedule.frequency == schedule.EVERY_X_HOURS and schedule.hours_interval:
-        return schedule.next_run + timedelta(hours=schedule.hours_interval)
-
-    # Require a time of day. If none, then set next feeding forward a day.
-    if not schedule.time_of_day:
-        return now + timedelta(days=1)
-
-    today = now.date()
-    time_today = timezone.make_aware(datetime.combine(today, schedule.time_of_day))
-
-    # For Daily
-    if schedule.frequency == schedule.DAILY:
-        # Verify time is in the past
-        if time_today > now:
-            return time_today
-        return time_today + timedelta(days=1)
-
-    # For Weekly
-    if schedule.frequency == schedule.WEEKLY and schedule.day_of_week:
-        target = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun'].index(schedule.day_of_week)
-        today_wd = today.weekday()
-
-        days_ahead = (target - today_wd) % 7
-        run_date = today + timedelta(days=days_ahead)
-        next_run = timezone.make_aware(datetime.combine(run_date, schedule.time_of_day))
-
-        # Verify time is in the past
-        if next_run < now:
-            next_run += timedelta(days=7)
-
-        return next_run
-
-    # Fallback
-    return now + timedelta(days=1)
-
-# Function to start the background scheduler
+def calculate_next_run(schedule, now=None):
+    return next_occurrence(schedule, now or timezone.now())
+
+# Run the feeding check only in the process holding the scheduler lease
+def run_feeding_check():
+    if holds_lease():
+        check_feeding_schedules()
+
+# Renew the lease. Load the timer as soon as this process becomes the leader,
+# or when another process changed a schedule that is due soon.
+def heartbeat(timer):
+    was_leader = holds_lease()
+    if renew_lease(snapshot()) and (not was_leader or take_reload_request()):
+        timer.reconcile()
+
+# Reload the timer from the database, leader only
+def reconcile(timer):
+    if holds_lease():
+        timer.reconcile()
+
+# Purge old notifications, leader only
+def run_retention():
+    if holds_lease():
+        purge_notifications()
+
+# Send low-stock alerts, leader only
+def run_low_stock_check():
+    if holds_lease():
+        notify_low_stock()
+
+# Move old logs to the archive, leader only
+def run_log_archive():
+    if holds_lease():
+        archive_logs()
+
+# Function to start the background scheduler.
+# The timer fires check_feeding_schedules as soon as a schedule is due, and a slow
+# reconciliation job reloads the timer from the database as a safety net.
+# Every process may start it, but only the lease holder does any work.
 def start_scheduler():
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(check_feeding_schedules, 'interval', minutes=1)
-    scheduler.start()
\ No newline at end of file
+    global _scheduler
+    if _scheduler:
+        return _scheduler
+
+    timer = start_timer(run_feeding_check)
+
+    _scheduler = BackgroundScheduler()
+    _scheduler.add_job(heartbeat, 'interval', args=[timer], seconds=settings.SCHEDULER_LEASE_SECONDS / 3, next_run_time=timezone.now())
+    _scheduler.add_job(reconcile, 'interval', args=[timer], minutes=settings.SCHEDULER_RECONCILE_MINUTES)
+    _scheduler.add_job(run_retention, 'interval', hours=settings.NOTIFICATION_RETENTION_HOURS)
+    _scheduler.add_job(run_low_stock_check, 'interval', minutes=settings.FOOD_LOW_STOCK_CHECK_MINUTES)
+    _scheduler.add_job(run_log_archive, 'interval', hours=settings.LOG_ARCHIVE_HOURS)
+    _scheduler.add_listener(record_missed_job, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+    _scheduler.start()
+    return _scheduler
+
+# Stop the scheduler and hand the lease to another process
+def stop_scheduler():
+    global _scheduler
+    if _scheduler:
+        _scheduler.shutdown()
+        current_timer().stop()
+        release_lease()
+        _scheduler = None
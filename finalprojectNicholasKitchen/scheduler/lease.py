@@ -0,0 +1,68 @@
+import os
+import socket
+import uuid
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta
+from .metrics import snapshot
+from .models import SchedulerLease
+
+LEASE_NAME = 'feeding_schedules'
+
+# Unique name for this process
+HOLDER = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+# When the lease held by this process runs out, or None if it is not the leader
+_expires_at = None
+
+# Check whether this process is the leader without touching the database
+def holds_lease():
+    return _expires_at is not None and timezone.now() < _expires_at
+
+# Renew our lease, or take it over if the last leader stopped renewing it.
+# The leader also publishes its metrics so other processes can read them.
+def renew_lease(stats=None):
+    global _expires_at
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.SCHEDULER_LEASE_SECONDS)
+
+    acquired = SchedulerLease.objects.filter(name=LEASE_NAME).filter(Q(holder=HOLDER) | Q(expires_at__lt=now)).update(holder=HOLDER, expires_at=expires_at, stats=stats)
+
+    # Create the lease the first time any process asks for it
+    if not acquired and not SchedulerLease.objects.filter(name=LEASE_NAME).exists():
+        try:
+            with transaction.atomic():
+                SchedulerLease.objects.create(name=LEASE_NAME, holder=HOLDER, expires_at=expires_at, stats=stats)
+            acquired = True
+        except IntegrityError:
+            acquired = False
+
+    _expires_at = expires_at if acquired else None
+    return acquired
+
+# Give up the lease so another process can take over straight away
+def release_lease():
+    global _expires_at
+    _expires_at = None
+    SchedulerLease.objects.filter(name=LEASE_NAME, holder=HOLDER).update(expires_at=timezone.now())
+
+# Ask the leader to reload its timer from the database on its next heartbeat
+def request_reload():
+    SchedulerLease.objects.filter(name=LEASE_NAME, reload_requested=False).update(reload_requested=True)
+
+# Clear a pending reload request, returning whether there was one
+def take_reload_request():
+    return SchedulerLease.objects.filter(name=LEASE_NAME, holder=HOLDER, reload_requested=True).update(reload_requested=False) > 0
+
+# Metrics from this process if it is the leader, otherwise the ones the leader last published
+def leader_stats():
+    if holds_lease():
+        return {'holder': HOLDER, **snapshot()}
+
+    lease = SchedulerLease.objects.filter(name=LEASE_NAME).first()
+    if lease is None or lease.stats is None:
+        return {'holder': None}
+    return {'holder': lease.holder, **lease.stats}
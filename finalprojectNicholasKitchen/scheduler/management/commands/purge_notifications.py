@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from scheduler.retention import purge_notifications
+
+
+class Command(BaseCommand):
+    help = 'Delete read notifications past the retention age or over the per-user cap, archiving them first if configured.'
+
+    def handle(self, *args, **options):
+        reclaimed = purge_notifications()
+
+        self.stdout.write(f"Expired (older than {settings.NOTIFICATION_RETENTION_DAYS} days): {reclaimed['expired']}")
+        self.stdout.write(f"Over the cap of {settings.NOTIFICATION_MAX_READ_PER_USER} per user: {reclaimed['over_cap']}")
+        if settings.NOTIFICATION_ARCHIVE_DIR:
+            self.stdout.write(f'Archived to {settings.NOTIFICATION_ARCHIVE_DIR}')
+        self.stdout.write(self.style.SUCCESS(f"Reclaimed {reclaimed['expired'] + reclaimed['over_cap']} rows."))
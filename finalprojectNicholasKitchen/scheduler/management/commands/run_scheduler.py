@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from scheduler.jobs import start_scheduler, stop_scheduler
+
+
+class Command(BaseCommand):
+    help = 'Run the feeding schedule scheduler in its own process, outside the web workers.'
+
+    def handle(self, *args, **options):
+        start_scheduler()
+        self.stdout.write(self.style.SUCCESS('Scheduler started. Press CTRL+C to stop.'))
+
+        # The scheduler runs in background threads, so keep the process alive until interrupted
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop_scheduler()
+            self.stdout.write('Scheduler stopped.')
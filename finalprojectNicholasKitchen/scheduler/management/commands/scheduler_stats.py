@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand
+from scheduler.lease import leader_stats
+
+
+class Command(BaseCommand):
+    help = 'Show the rolling feeding schedule scheduler metrics published by the current leader.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the raw metrics as JSON.')
+
+    def handle(self, *args, **options):
+        stats = leader_stats()
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2))
+            return
+
+        if not stats.get('holder'):
+            self.stdout.write(self.style.WARNING('No scheduler is running.'))
+            return
+
+        # Summary of the window
+        self.stdout.write(f"Leader:             {stats['holder']}")
+        self.stdout.write(f"Published at:       {stats['generated_at']}")
+        self.stdout.write(f"Checks in window:   {stats['checks']}")
+        self.stdout.write(f"Schedules fired:    {stats['processed']}")
+        self.stdout.write(f"Avg / max duration: {stats['avg_duration_ms']} / {stats['max_duration_ms']} ms")
+        self.stdout.write(f"p95 / max lag:      {stats['p95_lag_seconds']} / {stats['max_lag_seconds']} s")
+        self.stdout.write(f"Overlapped checks:  {stats['overlapped_checks']}")
+        self.stdout.write(f"Missed jobs:        {stats['missed_jobs']}")
+        self.stdout.write(f"Failed checks:      {stats['failed_checks']}")
+
+        # Most recent checks
+        self.stdout.write('\nStarted at                        Duration(ms)  Due  Fired  Queries  Max lag(s)')
+        for tick in stats['recent_checks']:
+            self.stdout.write(f"{tick['started_at']:<34}{tick['duration_ms']:>12}{tick['due']:>5}{tick['processed']:>7}{tick['queries']:>9}  {tick['max_lag_seconds']}")
@@ -0,0 +1,78 @@
+import threading
+
+from collections import deque
+from django.conf import settings
+from django.utils import timezone
+from math import ceil
+
+# Rolling window of recent checks, plus the individual feeding lags seen in that window
+_ticks = deque(maxlen=settings.SCHEDULER_METRICS_WINDOW)
+_lags = deque(maxlen=settings.SCHEDULER_METRICS_WINDOW * 100)
+_counters = {'overlapped_checks': 0, 'missed_jobs': 0, 'failed_checks': 0}
+_lock = threading.Lock()
+
+# Counts the queries run on each connection it is installed on with connection.execute_wrapper()
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+# Helper function to find a percentile of a list of numbers
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(ceil(pct / 100 * len(values)) - 1, 0)]
+
+# Record one finished check of the feeding schedules
+def record_check(started_at, duration, due, processed, queries, lags, error=None):
+    tick = {
+        'started_at': started_at.isoformat(),
+        'duration_ms': round(duration * 1000, 1),
+        'due': due,
+        'processed': processed,
+        'queries': queries,
+        'max_lag_seconds': round(max(lags), 3) if lags else None,
+        'p95_lag_seconds': round(percentile(lags, 95), 3) if lags else None,
+        'error': error,
+    }
+    with _lock:
+        _ticks.append(tick)
+        _lags.extend(lags)
+        if error:
+            _counters['failed_checks'] += 1
+
+# Record a check that was skipped because the previous one was still running
+def record_overlap():
+    with _lock:
+        _counters['overlapped_checks'] += 1
+
+# Record a background job that APScheduler skipped or dropped
+def record_missed_job(event):
+    with _lock:
+        _counters['missed_jobs'] += 1
+
+# Summarise the rolling window as plain JSON-friendly data
+def snapshot():
+    with _lock:
+        ticks = list(_ticks)
+        lags = list(_lags)
+        counters = dict(_counters)
+
+    durations = [tick['duration_ms'] for tick in ticks]
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'checks': len(ticks),
+        **counters,
+        'max_duration_ms': max(durations) if durations else None,
+        'avg_duration_ms': round(sum(durations) / len(durations), 1) if durations else None,
+        'processed': sum(tick['processed'] for tick in ticks),
+        'max_lag_seconds': round(max(lags), 3) if lags else None,
+        'p95_lag_seconds': round(percentile(lags, 95), 3) if lags else None,
+        'recent_checks': ticks[-20:],
+    }
@@ -1,3 +1,17 @@
 from django.db import models
 
-# Create your models here.
+# --- Scheduler Lease model ---
+# Only the process holding an unexpired lease runs the feeding schedule checks
+class SchedulerLease(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    holder = models.CharField(max_length=100)
+    expires_at = models.DateTimeField()
+
+    # Set by other processes when a schedule changes, so the leader reloads its timer
+    reload_requested = models.BooleanField(default=False)
+
+    # Latest scheduler metrics published by the leader on each heartbeat
+    stats = models.JSONField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} held by {self.holder} until {self.expires_at}"
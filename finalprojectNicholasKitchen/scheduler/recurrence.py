@@ -0,0 +1,83 @@
+from django.utils import timezone
+from datetime import datetime, timedelta
+from math import ceil
+
+# Weekday codes in the same order as date.weekday()
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+# Helper function to find the first wall-clock feeding time strictly after now
+def _next_wall_time(time_of_day, now, day_of_week=None):
+    today = timezone.localtime(now).date()
+
+    # Daily schedules can run today, weekly schedules jump to their weekday
+    days_ahead = 0
+    if day_of_week:
+        days_ahead = (WEEKDAYS.index(day_of_week) - today.weekday()) % 7
+
+    next_run = timezone.make_aware(datetime.combine(today + timedelta(days=days_ahead), time_of_day))
+
+    # Push forward one period if the time is already past
+    if next_run <= now:
+        next_run = timezone.make_aware(datetime.combine(today + timedelta(days=days_ahead + (7 if day_of_week else 1)), time_of_day))
+
+    return next_run
+
+# Find the next feeding time for a schedule strictly after now
+def next_occurrence(schedule, now):
+    # For Every X Hours, step from the last planned run by whole intervals
+    if schedule.frequency == schedule.EVERY_X_HOURS and schedule.hours_interval:
+        interval = timedelta(hours=schedule.hours_interval)
+        if schedule.next_run is None:
+            return now + interval
+        if schedule.next_run > now:
+            return schedule.next_run
+        return schedule.next_run + interval * ((now - schedule.next_run) // interval + 1)
+
+    # Require a time of day. If none, then set next feeding forward a day.
+    if not schedule.time_of_day:
+        return now + timedelta(days=1)
+
+    # For Daily
+    if schedule.frequency == schedule.DAILY:
+        return _next_wall_time(schedule.time_of_day, now)
+
+    # For Weekly
+    if schedule.frequency == schedule.WEEKLY and schedule.day_of_week:
+        return _next_wall_time(schedule.time_of_day, now, schedule.day_of_week)
+
+    # Fallback
+    return now + timedelta(days=1)
+
+# Find the first run for a schedule that has not been saved yet
+def first_occurrence(schedule, now):
+    # Every X Hours counts from the moment the schedule is created
+    if schedule.frequency == schedule.EVERY_X_HOURS and schedule.hours_interval:
+        return now + timedelta(hours=schedule.hours_interval)
+
+    # Daily and weekly schedules need a time of day, otherwise run straight away
+    if schedule.time_of_day and (schedule.frequency == schedule.DAILY or (schedule.frequency == schedule.WEEKLY and schedule.day_of_week)):
+        return next_occurrence(schedule, now)
+    return now
+
+# Advance a due schedule past now and count how many runs were missed on the way
+def advance(schedule, now):
+    next_run = next_occurrence(schedule, now)
+
+    # Nothing was missed if the schedule was not due yet
+    if schedule.next_run is None or schedule.next_run > now:
+        return next_run, 0
+
+    # Interval runs are evenly spaced, daily and weekly runs are counted in wall-clock days
+    if schedule.frequency == schedule.EVERY_X_HOURS and schedule.hours_interval:
+        missed = (next_run - schedule.next_run) // timedelta(hours=schedule.hours_interval)
+    elif schedule.frequency in (schedule.DAILY, schedule.WEEKLY) and schedule.time_of_day:
+        days = (timezone.localtime(next_run).date() - timezone.localtime(schedule.next_run).date()).days
+        missed = ceil(days / (7 if schedule.frequency == schedule.WEEKLY else 1))
+    else:
+        missed = 1
+
+    return next_run, max(missed, 1)
+
+# Advance a whole batch of schedules against the same clock
+def advance_all(schedules, now):
+    return [advance(schedule, now) for schedule in schedules]
@@ -0,0 +1,91 @@
+import gzip
+import json
+import logging
+import shutil
+import uuid
+
+from collections import defaultdict
+from pathlib import Path
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from datetime import timedelta
+from zooventory.models import Notification
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = ('id', 'owner_id', 'schedule_id', 'message', 'occurrences', 'created_at')
+
+# Delete read notifications past the retention age, then trim each user down to the per-user cap.
+# Returns how many rows each rule reclaimed.
+def purge_notifications():
+    cutoff = timezone.now() - timedelta(days=settings.NOTIFICATION_RETENTION_DAYS)
+    read = Notification.objects.filter(is_read=True)
+
+    reclaimed = {'expired': _delete_in_chunks(read.filter(created_at__lt=cutoff)), 'over_cap': 0}
+
+    # Only users over the cap are visited
+    cap = settings.NOTIFICATION_MAX_READ_PER_USER
+    over_cap = read.values('owner').annotate(total=Count('id')).filter(total__gt=cap).values_list('owner', flat=True)
+    for owner_id in over_cap:
+        # Keep the newest notifications up to the cap and delete everything older than the last one kept
+        kept = read.filter(owner_id=owner_id).order_by('-created_at', '-id').values_list('created_at', 'id')[cap - 1:cap]
+        for created_at, notification_id in kept:
+            older = read.filter(owner_id=owner_id).filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=notification_id))
+            reclaimed['over_cap'] += _delete_in_chunks(older)
+
+    logger.info('Notification retention reclaimed %d expired and %d over-cap rows', reclaimed['expired'], reclaimed['over_cap'])
+    return reclaimed
+
+# Helper function to delete a queryset a bounded chunk at a time, each chunk in its own short transaction.
+# Archived rows are written to part files first and only appended to the archives once the delete commits,
+# so a rolled back chunk leaves nothing behind and its retry doesn't archive the same rows twice.
+def _delete_in_chunks(queryset):
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:settings.NOTIFICATION_RETENTION_CHUNK])
+        if not ids:
+            return deleted
+
+        parts = []
+        try:
+            with transaction.atomic():
+                if settings.NOTIFICATION_ARCHIVE_DIR:
+                    _archive(Notification.objects.filter(id__in=ids).values(*ARCHIVE_FIELDS), parts)
+                    transaction.on_commit(lambda parts=parts: _append_parts(parts))
+                deleted += Notification.objects.filter(id__in=ids).delete()[0]
+        except Exception:
+            _discard_parts(parts)
+            raise
+
+# Helper function to write notifications to a gzipped NDJSON part file per user before they are deleted.
+# Adds a (part, archive) pair of paths to parts for each file written.
+def _archive(rows, parts):
+    by_owner = defaultdict(list)
+    for row in rows:
+        by_owner[row['owner_id']].append(row)
+
+    archive_dir = Path(settings.NOTIFICATION_ARCHIVE_DIR)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    for owner_id, owner_rows in by_owner.items():
+        path = archive_dir / f'notifications_user_{owner_id}.ndjson.gz'
+        part = path.with_name(f'{path.name}.{uuid.uuid4().hex}.part')
+        parts.append((part, path))
+        with gzip.open(part, 'wt', encoding='utf-8') as archive:
+            for row in owner_rows:
+                archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+
+# Helper function to append committed part files to their archives.
+# Each part is a whole gzip member, which gzip readers treat as one continuous file with the ones before it.
+def _append_parts(parts):
+    for part, path in parts:
+        with open(part, 'rb') as source, open(path, 'ab') as archive:
+            shutil.copyfileobj(source, archive)
+        part.unlink()
+
+# Helper function to remove the part files of a chunk that was rolled back
+def _discard_parts(parts):
+    for part, path in parts:
+        part.unlink(missing_ok=True)
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from datetime import timedelta
+from zooventory.models import FeedingSchedule
+from .lease import holds_lease, request_reload
+from .timer import current_timer
+
+# Sent after the scheduler commits a chunk, with runs=[(schedule_id, next_run), ...]
+schedules_advanced = Signal()
+
+# Helper function to return the timer only if this process is the leader
+def _leader_timer():
+    timer = current_timer()
+    if timer and holds_lease():
+        return timer
+    return None
+
+# Wake the timer when a feeding schedule is created or changed
+@receiver(post_save, sender=FeedingSchedule)
+def feeding_schedule_saved(sender, instance, **kwargs):
+    # A naive next_run is stored as local time, so compare it the same way instead of failing the save
+    next_run = instance.next_run
+    if next_run and timezone.is_naive(next_run):
+        next_run = timezone.make_aware(next_run)
+
+    timer = _leader_timer()
+    if timer:
+        timer.schedule(instance.id, next_run)
+
+    # The leader is another process. It only needs telling if the run is due before its next reconciliation.
+    elif next_run and next_run <= timezone.now() + 2 * timedelta(minutes=settings.SCHEDULER_RECONCILE_MINUTES):
+        request_reload()
+
+# Drop a deleted feeding schedule from the timer
+@receiver(post_delete, sender=FeedingSchedule)
+def feeding_schedule_deleted(sender, instance, **kwargs):
+    timer = _leader_timer()
+    if timer:
+        timer.cancel(instance.id)
+
+# Put the runs the scheduler just moved back on the timer
+@receiver(schedules_advanced)
+def feeding_schedules_advanced(sender, runs, **kwargs):
+    timer = _leader_timer()
+    if timer:
+        for schedule_id, next_run in runs:
+            timer.schedule(schedule_id, next_run)
@@ -1,3 +1,322 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
+from zoneinfo import ZoneInfo
+from zooventory.models import FeedingSchedule, MyAnimal, Notification
+from . import lease
+from .jobs import _process_partition, heartbeat
+from .models import SchedulerLease
+from .retention import purge_notifications
+from .recurrence import advance, advance_all, next_occurrence
+
+CHICAGO = ZoneInfo('America/Chicago')
+
+# Helper function to build a Chicago wall-clock time as the UTC datetime the database hands back.
+# Arithmetic on UTC datetimes counts real hours, like it does on stored next runs.
+def chicago(*args):
+    return datetime(*args, tzinfo=CHICAGO).astimezone(dt_timezone.utc)
+
+# Helper function to measure the real time between two aware datetimes
+def elapsed(start, end):
+    return end.astimezone(dt_timezone.utc) - start.astimezone(dt_timezone.utc)
+
+
+@override_settings(TIME_ZONE='America/Chicago')
+class RecurrenceTests(SimpleTestCase):
+    # Interval schedules catch up by whole intervals and count every run missed while down
+    def test_interval_catch_up_after_downtime(self):
+        due = chicago(2026, 5, 4, 8, 0)
+        schedule = FeedingSchedule(frequency=FeedingSchedule.EVERY_X_HOURS, hours_interval=2, next_run=due)
+
+        next_run, missed = advance(schedule, due + timedelta(hours=25))
+
+        self.assertEqual(next_run, due + timedelta(hours=26))
+        self.assertEqual(missed, 13)
+
+    def test_interval_not_due_yet(self):
+        due = chicago(2026, 5, 4, 8, 0)
+        schedule = FeedingSchedule(frequency=FeedingSchedule.EVERY_X_HOURS, hours_interval=2, next_run=due)
+
+        self.assertEqual(advance(schedule, due - timedelta(minutes=1)), (due, 0))
+
+    # Weekly schedules roll over to the same weekday of the next week, whatever day it is now
+    def test_weekly_rollover_across_weekdays(self):
+        schedule = FeedingSchedule(frequency=FeedingSchedule.WEEKLY, day_of_week='mon', time_of_day=time(9, 0))
+
+        # Sunday 2026-05-10 rolls to the next day, Monday 2026-05-11
+        self.assertEqual(next_occurrence(schedule, chicago(2026, 5, 10, 10, 0)), chicago(2026, 5, 11, 9, 0))
+        # Monday before the time is the same day, after it is a week later
+        self.assertEqual(next_occurrence(schedule, chicago(2026, 5, 11, 8, 59)), chicago(2026, 5, 11, 9, 0))
+        self.assertEqual(next_occurrence(schedule, chicago(2026, 5, 11, 9, 0)), chicago(2026, 5, 18, 9, 0))
+
+        # Friday from a Wednesday
+        schedule.day_of_week = 'fri'
+        self.assertEqual(next_occurrence(schedule, chicago(2026, 5, 13, 12, 0)), chicago(2026, 5, 15, 9, 0))
+
+    def test_weekly_catch_up_counts_weeks(self):
+        due = chicago(2026, 5, 4, 9, 0)
+        schedule = FeedingSchedule(frequency=FeedingSchedule.WEEKLY, day_of_week='mon', time_of_day=time(9, 0), next_run=due)
+
+        next_run, missed = advance(schedule, chicago(2026, 5, 19, 10, 0))
+
+        self.assertEqual(next_run, chicago(2026, 5, 25, 9, 0))
+        self.assertEqual(missed, 3)
+
+    # Daily schedules keep their wall-clock time across daylight saving changes
+    def test_daily_across_spring_forward(self):
+        schedule = FeedingSchedule(frequency=FeedingSchedule.DAILY, time_of_day=time(8, 0))
+
+        # Clocks jump from 2:00 to 3:00 on 2026-03-08, so that day is only 23 hours long
+        before = next_occurrence(schedule, chicago(2026, 3, 7, 7, 0))
+        after = next_occurrence(schedule, chicago(2026, 3, 7, 9, 0))
+
+        self.assertEqual(timezone.localtime(after).time(), time(8, 0))
+        self.assertEqual(elapsed(before, after), timedelta(hours=23))
+        self.assertEqual(after.utcoffset(), timedelta(hours=-5))
+
+    def test_daily_across_fall_back(self):
+        schedule = FeedingSchedule(frequency=FeedingSchedule.DAILY, time_of_day=time(8, 0))
+
+        # Clocks go back from 2:00 to 1:00 on 2026-11-01, so that day is 25 hours long
+        before = next_occurrence(schedule, chicago(2026, 10, 31, 7, 0))
+        after = next_occurrence(schedule, chicago(2026, 10, 31, 9, 0))
+
+        self.assertEqual(timezone.localtime(after).time(), time(8, 0))
+        self.assertEqual(elapsed(before, after), timedelta(hours=25))
+
+    def test_daily_catch_up_across_dst(self):
+        due = chicago(2026, 3, 7, 8, 0)
+        schedule = FeedingSchedule(frequency=FeedingSchedule.DAILY, time_of_day=time(8, 0), next_run=due)
+
+        next_run, missed = advance(schedule, chicago(2026, 3, 9, 9, 0))
+
+        self.assertEqual(next_run, chicago(2026, 3, 10, 8, 0))
+        self.assertEqual(missed, 3)
+
+    # Interval schedules count real hours, so a DST change doesn't shift them
+    def test_interval_across_dst(self):
+        due = chicago(2026, 3, 8, 0, 0)
+        schedule = FeedingSchedule(frequency=FeedingSchedule.EVERY_X_HOURS, hours_interval=4, next_run=due)
+
+        next_run, missed = advance(schedule, due + timedelta(hours=5))
+
+        self.assertEqual(next_run, due + timedelta(hours=8))
+        self.assertEqual(timezone.localtime(next_run).hour, 9)
+        self.assertEqual(missed, 2)
+
+
+class ProcessPartitionTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create(username='keeper')
+        myanimal = MyAnimal.objects.create(owner=self.owner, name='Rex', species='Dog')
+        self.now = timezone.now()
+        self.schedule = FeedingSchedule.objects.create(myanimal=myanimal, frequency=FeedingSchedule.EVERY_X_HOURS, hours_interval=2,
+                                                       next_run=self.now - timedelta(minutes=1))
+
+    # Helper function to fire the schedule as of a time, returning the notifications published for it
+    def fire(self, now):
+        with mock.patch('scheduler.jobs.publish_notifications') as publish, self.captureOnCommitCallbacks(execute=True):
+            _process_partition([self.schedule.id], now)
+        return publish.call_args.args[0] if publish.called else []
+
+    # Runs missed while the reminder is unread are folded into it instead of adding rows
+    def test_unread_reminder_is_coalesced(self):
+        self.fire(self.now)
+        first = Notification.objects.get(schedule=self.schedule)
+        self.assertEqual(first.occurrences, 1)
+
+        # Five hours later two more runs have come due
+        published = self.fire(self.now + timedelta(hours=5))
+        reminder = Notification.objects.get(schedule=self.schedule)
+        self.assertEqual(reminder.id, first.id)
+        self.assertEqual(reminder.occurrences, 3)
+        self.assertGreater(reminder.created_at, first.created_at)
+        self.assertEqual([notification.id for notification in published], [first.id])
+
+    # Once the reminder is read the next run starts a new one
+    def test_read_reminder_starts_a_new_one(self):
+        self.fire(self.now)
+        Notification.objects.filter(schedule=self.schedule).update(is_read=True)
+
+        self.fire(self.now + timedelta(hours=2))
+        self.assertEqual(Notification.objects.filter(schedule=self.schedule).count(), 2)
+        self.assertEqual(Notification.objects.get(schedule=self.schedule, is_read=False).occurrences, 1)
+
+    # The partial unique constraint allows one unread reminder per schedule, and any number of read ones
+    def test_one_unread_reminder_per_schedule(self):
+        Notification.objects.create(owner=self.owner, schedule=self.schedule, message='Read', is_read=True)
+        Notification.objects.create(owner=self.owner, schedule=self.schedule, message='Read', is_read=True)
+        Notification.objects.create(owner=self.owner, schedule=self.schedule, message='Unread')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Notification.objects.create(owner=self.owner, schedule=self.schedule, message='Unread')
+
+    # A reminder marked read while its schedule was being fired gets a fresh notification, published once
+    def test_reminder_read_during_check_is_published_once(self):
+        reminder = Notification.objects.create(owner=self.owner, schedule=self.schedule, message="It's time to feed Rex")
+
+        # Mark the reminder read after the schedules were loaded with it
+        def read_then_advance(schedules, now):
+            Notification.objects.filter(id=reminder.id).update(is_read=True)
+            return advance_all(schedules, now)
+
+        with mock.patch('scheduler.jobs.advance_all', read_then_advance):
+            published = self.fire(self.now)
+
+        self.assertEqual(len(published), 1)
+        self.assertNotEqual(published[0].id, reminder.id)
+        self.assertEqual(Notification.objects.filter(schedule=self.schedule, is_read=False).count(), 1)
+
+
+class LeaseTests(TestCase):
+    def setUp(self):
+        # Start every test as a follower, and leave no leadership behind
+        lease._expires_at = None
+        self.addCleanup(setattr, lease, '_expires_at', None)
+
+    def test_first_process_takes_the_lease(self):
+        self.assertTrue(lease.renew_lease())
+        self.assertTrue(lease.holds_lease())
+        self.assertEqual(SchedulerLease.objects.get(name=lease.LEASE_NAME).holder, lease.HOLDER)
+
+        # Renewing pushes the expiry forward
+        expires_at = SchedulerLease.objects.get(name=lease.LEASE_NAME).expires_at
+        self.assertTrue(lease.renew_lease())
+        self.assertGreaterEqual(SchedulerLease.objects.get(name=lease.LEASE_NAME).expires_at, expires_at)
+
+    def test_live_lease_is_not_taken_over(self):
+        SchedulerLease.objects.create(name=lease.LEASE_NAME, holder='other', expires_at=timezone.now() + timedelta(minutes=1))
+
+        self.assertFalse(lease.renew_lease())
+        self.assertFalse(lease.holds_lease())
+        self.assertEqual(SchedulerLease.objects.get(name=lease.LEASE_NAME).holder, 'other')
+
+    def test_expired_lease_is_taken_over(self):
+        SchedulerLease.objects.create(name=lease.LEASE_NAME, holder='other', expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertTrue(lease.renew_lease())
+        self.assertTrue(lease.holds_lease())
+        self.assertEqual(SchedulerLease.objects.get(name=lease.LEASE_NAME).holder, lease.HOLDER)
+
+    def test_leadership_runs_out_without_renewal(self):
+        self.assertTrue(lease.renew_lease())
+        lease._expires_at = timezone.now() - timedelta(seconds=1)
+        self.assertFalse(lease.holds_lease())
+
+    def test_released_lease_is_taken_straight_away(self):
+        self.assertTrue(lease.renew_lease())
+        lease.release_lease()
+        self.assertFalse(lease.holds_lease())
+
+        with mock.patch.object(lease, 'HOLDER', 'other'):
+            self.assertTrue(lease.renew_lease())
+        self.assertEqual(SchedulerLease.objects.get(name=lease.LEASE_NAME).holder, 'other')
+
+    # A reload asked for by another process is handled once by the leader's next heartbeat
+    def test_reload_request_reconciles_the_timer_once(self):
+        timer = mock.Mock()
+        heartbeat(timer)
+        self.assertEqual(timer.reconcile.call_count, 1)
+
+        heartbeat(timer)
+        self.assertEqual(timer.reconcile.call_count, 1)
+
+        lease.request_reload()
+        self.assertTrue(SchedulerLease.objects.get(name=lease.LEASE_NAME).reload_requested)
+        heartbeat(timer)
+        self.assertEqual(timer.reconcile.call_count, 2)
+        self.assertFalse(SchedulerLease.objects.get(name=lease.LEASE_NAME).reload_requested)
+
+    # Only the holder can clear a reload request
+    def test_follower_cannot_take_reload_request(self):
+        SchedulerLease.objects.create(name=lease.LEASE_NAME, holder='other', expires_at=timezone.now() + timedelta(minutes=1), reload_requested=True)
+        self.assertFalse(lease.take_reload_request())
+        self.assertTrue(SchedulerLease.objects.get(name=lease.LEASE_NAME).reload_requested)
+
+
+class ScheduleSignalTests(TestCase):
+    def setUp(self):
+        lease._expires_at = None
+        owner = get_user_model().objects.create(username='keeper')
+        self.myanimal = MyAnimal.objects.create(owner=owner, name='Rex', species='Dog')
+
+    # A naive next_run, like load_test_data.py saves, is read as local time instead of failing the save
+    def test_naive_next_run_without_timer_or_lease(self):
+        SchedulerLease.objects.create(name=lease.LEASE_NAME, holder='other', expires_at=timezone.now() + timedelta(minutes=1))
+
+        with mock.patch('scheduler.signals.current_timer', return_value=None):
+            schedule = FeedingSchedule.objects.create(myanimal=self.myanimal, frequency=FeedingSchedule.DAILY, time_of_day=time(9, 0),
+                                                      next_run=datetime.now())
+
+        self.assertIsNotNone(schedule.id)
+        self.assertTrue(SchedulerLease.objects.get(name=lease.LEASE_NAME).reload_requested)
+
+    # The leader's own timer gets the run as an aware datetime
+    def test_naive_next_run_on_leader_timer(self):
+        timer = mock.Mock()
+        next_run = datetime.now() + timedelta(hours=1)
+        with mock.patch('scheduler.signals.current_timer', return_value=timer), mock.patch('scheduler.signals.holds_lease', return_value=True):
+            schedule = FeedingSchedule.objects.create(myanimal=self.myanimal, frequency=FeedingSchedule.DAILY, time_of_day=time(9, 0),
+                                                      next_run=next_run)
+
+        timer.schedule.assert_called_once_with(schedule.id, timezone.make_aware(next_run))
+
+
+@override_settings(NOTIFICATION_RETENTION_DAYS=90, NOTIFICATION_MAX_READ_PER_USER=3, NOTIFICATION_RETENTION_CHUNK=2, NOTIFICATION_ARCHIVE_DIR=None)
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create(username='keeper')
+        now = timezone.now()
+
+        # Two read notifications past the retention age, five recent read ones and an old unread one
+        self.expired = self.notifications(2, is_read=True, created_at=now - timedelta(days=100))
+        self.recent = self.notifications(5, is_read=True, created_at=now - timedelta(days=1))
+        self.unread = self.notifications(1, is_read=False, created_at=now - timedelta(days=100))
+
+    # Helper function to create notifications a minute apart, returning their ids oldest first
+    def notifications(self, count, is_read, created_at):
+        ids = []
+        for i in range(count):
+            notification = Notification.objects.create(owner=self.owner, message=f'Reminder {i}', is_read=is_read)
+            Notification.objects.filter(id=notification.id).update(created_at=created_at + timedelta(minutes=i))
+            ids.append(notification.id)
+        return ids
+
+    def test_purge_expired_and_over_cap(self):
+        self.assertEqual(purge_notifications(), {'expired': 2, 'over_cap': 2})
+
+        # The newest read notifications up to the cap are kept, and unread ones are never purged
+        kept = set(Notification.objects.values_list('id', flat=True))
+        self.assertEqual(kept, set(self.recent[2:] + self.unread))
+
+    def test_archive_round_trip(self):
+        with tempfile.TemporaryDirectory() as archive_dir, override_settings(NOTIFICATION_ARCHIVE_DIR=archive_dir):
+            with self.captureOnCommitCallbacks(execute=True):
+                purge_notifications()
+
+            # Every purged row is in the owner's archive once, across the gzip members of each chunk
+            self.assertEqual([path.name for path in Path(archive_dir).iterdir()], [f'notifications_user_{self.owner.id}.ndjson.gz'])
+            with gzip.open(Path(archive_dir) / f'notifications_user_{self.owner.id}.ndjson.gz', 'rt', encoding='utf-8') as archive:
+                rows = [json.loads(line) for line in archive]
+
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(self.expired + self.recent[:2]))
+        self.assertEqual({row['owner_id'] for row in rows}, {self.owner.id})
+        self.assertEqual(rows[0]['message'], 'Reminder 0')
+
+    # A chunk whose delete is rolled back leaves no archive behind for its retry to duplicate
+    def test_rolled_back_chunk_leaves_no_file(self):
+        with tempfile.TemporaryDirectory() as archive_dir, override_settings(NOTIFICATION_ARCHIVE_DIR=archive_dir):
+            with mock.patch('django.db.models.query.QuerySet.delete', side_effect=DatabaseError), self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(DatabaseError):
+                    purge_notifications()
+
+            self.assertEqual(list(Path(archive_dir).iterdir()), [])
+        self.assertEqual(Notification.objects.count(), 8)
@@ -0,0 +1,103 @@
+import heapq
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from datetime import timedelta
+from zooventory.models import FeedingSchedule
+
+logger = logging.getLogger(__name__)
+
+# The timer running in this process, if any
+_timer = None
+
+def current_timer():
+    return _timer
+
+# Thread that sleeps until the earliest upcoming next_run instead of polling the database
+class FeedingTimer(threading.Thread):
+    def __init__(self, callback):
+        super().__init__(name='feeding-timer', daemon=True)
+        self.callback = callback
+
+        # Min-heap of (next_run, schedule_id) plus the run each schedule is currently planned for.
+        # Heap entries that no longer match the planned run are stale and skipped when popped.
+        self._heap = []
+        self._runs = {}
+        self._wake = threading.Condition()
+        self._stopped = False
+
+    # Add a schedule to the timer, or move it if it is already there
+    def schedule(self, schedule_id, next_run):
+        with self._wake:
+            if next_run is None:
+                self._runs.pop(schedule_id, None)
+            else:
+                self._runs[schedule_id] = next_run
+                heapq.heappush(self._heap, (next_run, schedule_id))
+            self._wake.notify()
+
+    # Remove a schedule from the timer
+    def cancel(self, schedule_id):
+        self.schedule(schedule_id, None)
+
+    # Safety net: reload every run due before the next reconciliation from the database
+    def reconcile(self):
+        horizon = timezone.now() + 2 * timedelta(minutes=settings.SCHEDULER_RECONCILE_MINUTES)
+        try:
+            runs = dict(FeedingSchedule.objects.filter(next_run__lte=horizon).values_list('id', 'next_run'))
+        finally:
+            close_old_connections()
+
+        with self._wake:
+            self._runs = runs
+            self._heap = [(next_run, schedule_id) for schedule_id, next_run in runs.items()]
+            heapq.heapify(self._heap)
+            self._wake.notify()
+
+    def stop(self):
+        with self._wake:
+            self._stopped = True
+            self._wake.notify()
+
+    # Sleep until the earliest run is due, then hand off to the callback
+    def run(self):
+        while True:
+            with self._wake:
+                while not self._stopped:
+                    # Throw away stale heap entries
+                    while self._heap and self._runs.get(self._heap[0][1]) != self._heap[0][0]:
+                        heapq.heappop(self._heap)
+
+                    now = timezone.now()
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+
+                    # Wait for the earliest run, or until a schedule change wakes us up
+                    self._wake.wait((self._heap[0][0] - now).total_seconds() if self._heap else None)
+
+                if self._stopped:
+                    return
+
+                # Everything due now is handled by a single callback
+                while self._heap and self._heap[0][0] <= now:
+                    next_run, schedule_id = heapq.heappop(self._heap)
+                    if self._runs.get(schedule_id) == next_run:
+                        del self._runs[schedule_id]
+
+            # Keep the thread alive if a check fails; the next reconciliation retries the due schedules
+            try:
+                self.callback()
+            except Exception:
+                logger.exception('Feeding schedule check failed')
+            finally:
+                close_old_connections()
+
+# Start the timer for this process
+def start_timer(callback):
+    global _timer
+    _timer = FeedingTimer(callback)
+    _timer.start()
+    return _timer
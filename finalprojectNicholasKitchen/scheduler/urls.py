@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    # Scheduler Metrics URL
+    path('stats/', views.scheduler_stats, name='scheduler_stats'),
+]
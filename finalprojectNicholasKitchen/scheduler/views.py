@@ -1,3 +1,12 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from .lease import leader_stats
 
-# Create your views here.
+# -----------------------------
+# Scheduler Metrics
+# -----------------------------
+
+@staff_member_required
+def scheduler_stats(request):
+    # Return the rolling scheduler metrics from the current leader
+    return JsonResponse(leader_stats())
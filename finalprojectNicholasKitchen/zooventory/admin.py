@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UniqueAnimal, MyAnimal, Food, FeedingSchedule, Log, Notification
+from .models import UniqueAnimal, MyAnimal, Food, FeedingSchedule, Log, LogArchive, DailyFeedingRollup, Notification
 
 
 @admin.register(UniqueAnimal)
@@ -19,7 +19,7 @@ class MyAnimalAdmin(admin.ModelAdmin):
 
 @admin.register(Food)
 class FoodAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'amount', 'unit', 'owner')
+    list_display = ('id', 'name', 'amount', 'unit', 'density', 'burn_rate', 'low_stock_notified', 'owner')
     search_fields = ('name', 'owner__username')
     ordering = ('name',)
 
@@ -41,7 +41,7 @@ class FeedingScheduleAdmin(admin.ModelAdmin):
 
 @admin.register(Log)
 class LogAdmin(admin.ModelAdmin):
-    list_display = ('id', 'log_type', 'created_at', 'owner', 'myanimal', 'food', 'description', 'amount_fed', 'unit', 'converted_amount_grams', 'converted_amount_ml', 'weight_lb', 'weight_oz')
+    list_display = ('id', 'log_type', 'created_at', 'owner', 'myanimal', 'food', 'description', 'amount_fed', 'unit', 'converted_amount_grams', 'converted_amount_ml', 'canonical_grams', 'weight_lb', 'weight_oz')
     search_fields = ('log_type', 'owner__username', 'myanimal__name')
     ordering = ('-created_at',)
 
@@ -52,9 +52,38 @@ class LogAdmin(admin.ModelAdmin):
     def has_change_permission(self, request, obj=None):
         return False
 
+@admin.register(LogArchive)
+class LogArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'log_type', 'created_at', 'owner', 'myanimal', 'food', 'description', 'amount_fed', 'unit', 'canonical_grams', 'weight_lb', 'weight_oz')
+    search_fields = ('log_type', 'owner__username', 'myanimal__name')
+    ordering = ('-created_at',)
+
+    # Archived logs are moved here by manage.py archive_logs, they can be read or deleted
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(DailyFeedingRollup)
+class DailyFeedingRollupAdmin(admin.ModelAdmin):
+    list_display = ('id', 'day', 'owner', 'myanimal', 'food', 'total_grams', 'total_ml', 'total_canonical_grams', 'feed_count')
+    search_fields = ('owner__username', 'myanimal__name')
+    ordering = ('-day',)
+
+    # Rollups are derived from the logs, rebuild them with manage.py rebuild_feeding_rollups
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ('id', 'created_at', 'owner', 'message', 'is_read')
+    list_display = ('id', 'created_at', 'owner', 'message', 'occurrences', 'is_read')
     search_fields = ('owner__username',)
     ordering = ('-created_at',)
 
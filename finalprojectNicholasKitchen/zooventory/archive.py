@@ -0,0 +1,64 @@
+import heapq
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from .models import Log, LogArchive
+
+logger = logging.getLogger(__name__)
+
+# Hot and cold log storage.
+# Recent logs live in the Log table, which every write and most reads use. Logs from before the archive
+# horizon, local midnight LOG_ARCHIVE_AFTER_DAYS ago, are moved to LogArchive a chunk at a time. The daily
+# feeding rollups are left alone, so the feeding charts keep their full history, and the few reads that
+# go past the horizon read both tables.
+
+ARCHIVE_FIELDS = [field.attname for field in LogArchive._meta.concrete_fields]
+
+# Return the first moment that is kept in the Log table
+def archive_horizon(now=None):
+    start = timezone.localdate(now) - timedelta(days=settings.LOG_ARCHIVE_AFTER_DAYS)
+    return timezone.make_aware(datetime.combine(start, time.min))
+
+# Return the log models a read starting on this local date needs, archive first. Everything
+# archived is from before the current horizon, so reads that start after it skip the archive.
+def log_models(start_date=None):
+    if start_date is not None and start_date >= timezone.localdate(archive_horizon()):
+        return (Log,)
+    return (LogArchive, Log)
+
+# Read the same ordered rows from the archive and the Log table as one stream, in order.
+# Each table is read with its own iterator, so nothing is held beyond the current row of each.
+def merged_rows(querysets, key, chunk_size):
+    iterators = [queryset.iterator(chunk_size=chunk_size) for queryset in querysets]
+    return iterators[0] if len(iterators) == 1 else heapq.merge(*iterators, key=key)
+
+# Move logs from before the horizon to the archive. Log ids grow with created_at, so the old logs are
+# found by walking the primary key a chunk at a time, stopping at the first chunk with none to move.
+# Each chunk is copied and deleted in its own transaction. Returns how many logs were moved.
+def archive_logs(now=None):
+    horizon = archive_horizon(now)
+    chunk_size = settings.LOG_ARCHIVE_CHUNK
+    moved = 0
+    last_id = 0
+
+    while True:
+        chunk = list(Log.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'created_at')[:chunk_size])
+        old_ids = [log_id for log_id, created_at in chunk if created_at < horizon]
+        if not old_ids:
+            break
+
+        with transaction.atomic():
+            # A copy left behind by an interrupted run is kept rather than duplicated
+            rows = Log.objects.filter(id__in=old_ids).values(*ARCHIVE_FIELDS)
+            LogArchive.objects.bulk_create([LogArchive(**row) for row in rows], ignore_conflicts=True)
+            moved += Log.objects.filter(id__in=old_ids).delete()[0]
+
+        last_id = chunk[-1][0]
+        if len(chunk) < chunk_size:
+            break
+
+    logger.info('Log archival moved %d logs from before %s', moved, horizon)
+    return moved
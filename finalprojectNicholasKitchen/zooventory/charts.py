@@ -0,0 +1,149 @@
+import time
+
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import DateField, F
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from datetime import timedelta
+from .archive import log_models
+from .models import Log
+
+# Chart ranges in days, None for the user's whole history
+CHART_RANGES = {'7d': 7, '30d': 30, '90d': 90, '1y': 365, 'all': None}
+CHART_BUCKETS = ('day', 'week', 'month')
+
+# -----------------------------
+# Chart window and buckets
+# -----------------------------
+
+# Helper function to find the first day of the bucket a date falls in. Weeks start on Monday like TruncWeek.
+def bucket_start(date, bucket):
+    if bucket == 'week':
+        return date - timedelta(days=date.weekday())
+    if bucket == 'month':
+        return date.replace(day=1)
+    return date
+
+# Helper function to find the first day of the next bucket
+def _next_bucket(date, bucket):
+    if bucket == 'week':
+        return date + timedelta(days=7)
+    if bucket == 'month':
+        return (date + timedelta(days=32)).replace(day=1)
+    return date + timedelta(days=1)
+
+# Work out the window a chart request asks for with its range, bucket and n parameters,
+# 30 days by day and a top 5 when they are left out. Returns the first day, the bucket size,
+# the start of every bucket up to today and the top N. Raises ValueError for values it doesn't know.
+def chart_window(owner, params):
+    chart_range = params.get('range', '30d')
+    bucket = params.get('bucket', 'day')
+    if chart_range not in CHART_RANGES or bucket not in CHART_BUCKETS:
+        raise ValueError(f"range must be one of {', '.join(CHART_RANGES)} and bucket one of {', '.join(CHART_BUCKETS)}")
+
+    # How many entries ranked charts show
+    top = params.get('n', '5')
+    if not top.isdigit() or not 1 <= int(top) <= settings.CHART_MAX_TOP:
+        raise ValueError(f'n must be a whole number from 1 to {settings.CHART_MAX_TOP}')
+
+    today = timezone.localdate()
+    if CHART_RANGES[chart_range]:
+        start_date = today - timedelta(days=CHART_RANGES[chart_range] - 1)
+    else:
+        # The whole history starts at the user's first log, looking in the archive first
+        first = None
+        for model in log_models():
+            first = model.objects.filter(owner=owner).order_by('id').values_list('created_at', flat=True).first()
+            if first:
+                break
+        start_date = timezone.localdate(first) if first else today
+
+    buckets = []
+    current = bucket_start(start_date, bucket)
+    while current <= today:
+        buckets.append(current)
+        current = _next_bucket(current, bucket)
+
+    return {'start_date': start_date, 'bucket': bucket, 'buckets': buckets, 'top': int(top)}
+
+# Decorator for chart views that reads the range and bucket parameters and passes the window on,
+# answering 400 for values it doesn't know
+def chart_params(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            window = chart_window(request.user, request.GET)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return view(request, window, *args, **kwargs)
+    return wrapper
+
+# Database expression that truncates a date or datetime field to the start of its bucket, as a date
+def bucket_expression(field, bucket, is_datetime=False):
+    if bucket == 'week':
+        return TruncWeek(field, output_field=DateField())
+    if bucket == 'month':
+        return TruncMonth(field, output_field=DateField())
+    return TruncDate(field) if is_datetime else F(field)
+
+# -----------------------------
+# Conditional GET and caching
+# -----------------------------
+
+# Chart responses are validated by an ETag built from the user's latest log, the day the chart
+# window ends on and a per-user version. New logs move the first, midnight moves the second and
+# invalidate_charts moves the third for changes that don't add a log (deletes, renames).
+
+# Helper function to build the cache key for a user's chart version
+def _version_key(owner_id):
+    return f'chart_version:{owner_id}'
+
+# Return a user's chart version. A missing version is replaced with a new one rather than
+# reset, so an ETag issued before the cache lost it can never match again.
+def chart_version(owner_id):
+    version = cache.get(_version_key(owner_id))
+    if version is None:
+        cache.add(_version_key(owner_id), time.time_ns(), None)
+        version = cache.get(_version_key(owner_id))
+    return version
+
+# Make the cached charts and ETags of these users stale after their logs, animals or food change
+def invalidate_charts(owner_ids):
+    cache.set_many({_version_key(owner_id): time.time_ns() for owner_id in set(owner_ids)}, None)
+
+# Helper function to build a user's current chart ETag for a chart window with one indexed lookup.
+# The window is the validated one, so parameters spelled differently but meaning the same share an ETag.
+def chart_etag(owner_id, window):
+    latest_id = Log.objects.filter(owner_id=owner_id).order_by('-id').values_list('id', flat=True).first()
+    params = f"{window['start_date']:%Y%m%d}-{window['bucket']}-{window['top']}"
+    return f'"{latest_id or 0}-{timezone.localdate():%Y%m%d}-{chart_version(owner_id)}-{params}"'
+
+# Decorator for chart JSON views, applied under chart_params so the parameters are validated first.
+# Answers 304 when the browser already has the current chart, otherwise serves the payload from the
+# per-user cache and only builds it on a miss.
+def cached_chart(view):
+    @wraps(view)
+    def wrapper(request, window, *args, **kwargs):
+        etag = chart_etag(request.user.id, window)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            key = f'chart:{request.user.id}:{request.path}:{etag}'
+            content = cache.get(key)
+            if content is None:
+                response = view(request, window, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response.content, settings.CHART_CACHE_SECONDS)
+            else:
+                response = HttpResponse(content, content_type='application/json')
+
+        # Browsers keep the chart but check back every time
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
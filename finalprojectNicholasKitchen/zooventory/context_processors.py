@@ -1,12 +1,11 @@
-from .models import Notification
+from .notifications import unread_summary
 
 def unread_notifcations(request):
     if request.user.is_authenticated:
-        # Find all unread messages and store the most recent 5
-        unread = Notification.objects.filter(owner=request.user, is_read=False)
-        recent = unread.order_by('-created_at')[:5]
+        # Unread count and the most recent 5, cached until the user's notifications change
+        summary = unread_summary(request.user.id)
         return {
-            'unread_notifications': unread,
-            'recent_notifications': recent,
+            'unread_count': summary['count'],
+            'recent_notifications': summary['recent'],
         }
-    return {}
\ No newline at end of file
+    return {}
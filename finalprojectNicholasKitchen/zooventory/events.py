@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+from collections import defaultdict
+
+# In-process fan-out of notification events to the users' open event streams.
+# Each stream owns an asyncio queue on its event loop, and publishers in any thread
+# hand events over with call_soon_threadsafe, so an idle stream costs no thread and no queries.
+class NotificationHub:
+    def __init__(self, max_queued=100):
+        self.max_queued = max_queued
+        self._streams = defaultdict(set)
+        self._lock = threading.Lock()
+
+    # Register a stream for a user. Must be called from the stream's event loop.
+    def subscribe(self, owner_id):
+        stream = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.max_queued))
+        with self._lock:
+            self._streams[owner_id].add(stream)
+        return stream[1]
+
+    def unsubscribe(self, owner_id, queue):
+        with self._lock:
+            self._streams[owner_id] = {stream for stream in self._streams[owner_id] if stream[1] is not queue}
+            if not self._streams[owner_id]:
+                del self._streams[owner_id]
+
+    # Send an event to every open stream of a user. Safe to call from any thread.
+    def publish(self, owner_id, event):
+        with self._lock:
+            streams = list(self._streams.get(owner_id, ()))
+        for loop, queue in streams:
+            loop.call_soon_threadsafe(self._put, queue, event)
+
+    def subscribers(self):
+        with self._lock:
+            return sum(len(streams) for streams in self._streams.values())
+
+    # A slow client loses its oldest events rather than growing the queue forever
+    @staticmethod
+    def _put(queue, event):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+hub = NotificationHub()
+
+# Helper function to publish notifications the scheduler just wrote
+def publish_notifications(notifications):
+    for notification in notifications:
+        hub.publish(notification.owner_id, {
+            'type': 'notification',
+            'notification': {
+                'id': notification.id,
+                'message': notification.message,
+                'occurrences': notification.occurrences,
+                'created_at': notification.created_at.isoformat(),
+            },
+        })
+
+# Helper function to tell a user's streams that notifications were marked read
+def publish_read(owner_id):
+    hub.publish(owner_id, {'type': 'read'})
@@ -0,0 +1,111 @@
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
+from .archive import log_models, merged_rows
+from .models import Log
+
+# Log exports as CSV or NDJSON.
+# Rows come from one query per table with the animal and food names joined in, read through iterator() a chunk
+# at a time, and are written out a block at a time, so memory stays flat however long the history is.
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+# Columns of an export, and the Log fields they come from
+EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('log_type', 'log_type'),
+    ('animal', 'myanimal__name'),
+    ('food', 'food__name'),
+    ('amount_fed', 'amount_fed'),
+    ('unit', 'unit'),
+    ('converted_amount_grams', 'converted_amount_grams'),
+    ('converted_amount_ml', 'converted_amount_ml'),
+    ('canonical_grams', 'canonical_grams'),
+    ('weight_lb', 'weight_lb'),
+    ('weight_oz', 'weight_oz'),
+    ('notes', 'description'),
+)
+
+# Read the start, end and type filters of an export. start and end are local dates and both are included.
+# Raises ValueError for values it doesn't know.
+def export_filters(start=None, end=None, log_types=None):
+    filters = {}
+    for name, value in (('start', start), ('end', end)):
+        if value:
+            date = parse_date(value) if isinstance(value, str) else value
+            if date is None:
+                raise ValueError(f'{name} must be a date like 2025-01-31')
+            filters[name] = date
+
+    log_types = [log_type for log_type in log_types or [] if log_type]
+    known = [choice for choice, label in Log.LOG_TYPE_CHOICES]
+    if any(log_type not in known for log_type in log_types):
+        raise ValueError(f"type must be one of {', '.join(known)}")
+    if log_types:
+        filters['log_types'] = log_types
+    return filters
+
+# Return the rows of a user's export, oldest first, as tuples in EXPORT_COLUMNS order.
+# The date filters are turned into created_at bounds so the log indexes can be used. Exports that
+# reach past the archive horizon merge the archived logs in.
+def export_rows(owner_id, filters):
+    querysets = []
+    for model in log_models(filters.get('start')):
+        logs = model.objects.filter(owner_id=owner_id)
+        if 'start' in filters:
+            logs = logs.filter(created_at__gte=timezone.make_aware(datetime.combine(filters['start'], time.min)))
+        if 'end' in filters:
+            logs = logs.filter(created_at__lt=timezone.make_aware(datetime.combine(filters['end'] + timedelta(days=1), time.min)))
+        if 'log_types' in filters:
+            logs = logs.filter(log_type__in=filters['log_types'])
+
+        fields = [field for column, field in EXPORT_COLUMNS]
+        querysets.append(logs.order_by('created_at', 'id').values_list(*fields))
+
+    # Ordered by created_at, then id
+    return merged_rows(querysets, key=lambda row: (row[1], row[0]), chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+# Helper class that hands csv.writer's output straight back instead of buffering it
+class _Echo:
+    def write(self, value):
+        return value
+
+# Turn rows into blocks of CSV or NDJSON text, one block per EXPORT_CHUNK_SIZE rows
+def export_blocks(rows, format='csv'):
+    columns = [column for column, field in EXPORT_COLUMNS]
+    if format == 'ndjson':
+        encode = lambda row: json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+    else:
+        writer = csv.writer(_Echo())
+        encode = writer.writerow
+        yield encode(columns)
+
+    block = []
+    for row in rows:
+        block.append(encode(row))
+        if len(block) >= settings.EXPORT_CHUNK_SIZE:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+# Same blocks for ASGI servers, which would otherwise read a plain iterator to the end before sending anything.
+# Each block is built in the worker thread that holds the database connection.
+async def async_export_blocks(rows, format='csv'):
+    blocks = export_blocks(rows, format)
+    try:
+        while True:
+            block = await sync_to_async(next)(blocks, None)
+            if block is None:
+                return
+            yield block
+    finally:
+        # Let go of the database cursor when the client goes away part way through
+        await sync_to_async(blocks.close)()
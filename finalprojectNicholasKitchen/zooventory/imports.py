@@ -0,0 +1,119 @@
+import csv
+import json
+
+from collections import defaultdict
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from .charts import invalidate_charts
+from .models import Log, MyAnimal
+
+# Bulk weigh-in imports from CSV or NDJSON.
+# Rows are read one at a time from a stream of lines and written a chunk at a time, so memory stays
+# the same however long the file is. Each row needs the animal's name and weight_lb and/or weight_oz
+# (a blank one counts as 0), and may carry notes. Bad rows are reported by line and skipped.
+
+WEIGHT_FORMATS = ('csv', 'ndjson')
+
+# Helper function to pick a format from a file name, CSV unless it looks like NDJSON
+def format_for(filename):
+    return 'ndjson' if filename.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+
+# Read (line number, row dict) pairs from lines of text. Rows that can't be parsed come back as
+# (line number, error message) instead.
+def read_rows(lines, format='csv'):
+    if format == 'ndjson':
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_number, 'Not valid JSON.'
+                continue
+            yield line_number, row if isinstance(row, dict) else 'Expected a JSON object.'
+        return
+
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+# Import weigh-ins for one user. Returns how many rows were imported, how many failed, and the
+# first IMPORT_MAX_ERRORS errors as (line number, message).
+def import_weights(owner, lines, format='csv', chunk_size=None):
+    rows = read_rows(lines, format)
+    result = {'imported': 0, 'failed': 0, 'errors': []}
+
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size or settings.IMPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+
+            imported, errors = _import_chunk(owner, chunk)
+            result['imported'] += imported
+            result['failed'] += len(errors)
+            result['errors'] += errors[:settings.IMPORT_MAX_ERRORS - len(result['errors'])]
+    finally:
+        # Chunks written before a failure stay written
+        if result['imported']:
+            invalidate_charts([owner.id])
+    return result
+
+# Helper function to validate and write one chunk in its own transaction.
+# Returns how many rows were written and the errors for the rest.
+def _import_chunk(owner, chunk):
+    errors = []
+    valid = []
+    for line_number, row in chunk:
+        if isinstance(row, str):
+            errors.append((line_number, row))
+            continue
+
+        name, weight, error = _parse_row(row)
+        if error:
+            errors.append((line_number, error))
+        else:
+            valid.append((line_number, name, weight, str(row.get('notes') or '') or None))
+
+    # Resolve every name in the chunk with one query
+    ids_by_name = defaultdict(list)
+    names = {name for line_number, name, weight, notes in valid}
+    for name, myanimal_id in MyAnimal.objects.filter(owner=owner, name__in=names).values_list('name', 'id'):
+        ids_by_name[name].append(myanimal_id)
+
+    logs = []
+    latest = {}
+    for line_number, name, (weight_lb, weight_oz), notes in valid:
+        ids = ids_by_name.get(name, [])
+        if len(ids) != 1:
+            errors.append((line_number, f'No animal named {name}.' if not ids else f'More than one animal is named {name}.'))
+            continue
+
+        logs.append(Log(owner=owner, myanimal_id=ids[0], log_type=Log.WEIGHT_UPDATE, description=notes, weight_lb=weight_lb, weight_oz=weight_oz))
+        # The last weigh-in of an animal in the file is its current weight
+        latest[ids[0]] = MyAnimal(id=ids[0], weight_lb=weight_lb, weight_oz=weight_oz)
+
+    with transaction.atomic():
+        Log.objects.bulk_create(logs)
+        MyAnimal.objects.bulk_update(latest.values(), ['weight_lb', 'weight_oz'])
+
+    return len(logs), sorted(errors)
+
+# Helper function to check one row like the weigh form does. Returns the name, (lb, oz) and an error message or None.
+def _parse_row(row):
+    name = str(row.get('name') or '').strip()
+    if not name:
+        return None, None, 'Missing the animal name.'
+
+    try:
+        weight_lb = int(str(row.get('weight_lb') or 0).strip())
+        weight_oz = int(str(row.get('weight_oz') or 0).strip())
+    except (TypeError, ValueError):
+        return name, None, 'Weight inputs must be an integer.'
+
+    if weight_lb < 0 or weight_oz < 0:
+        return name, None, 'Weight inputs cannot be negative.'
+    if weight_lb == 0 and weight_oz == 0:
+        return name, None, 'Weight cannot be zero.'
+    return name, (weight_lb, weight_oz), None
@@ -0,0 +1,159 @@
+import math
+
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from .events import publish_notifications
+from .models import DailyFeedingRollup, Food, Notification
+from .notifications import invalidate_unread
+from .utils.conversions import GRAM_CONVERSION, VOLUME_CONVERSION, convert_to_canonical_grams
+
+# Food burn rates and days-until-empty forecasts.
+# The burn rate is an exponentially weighted moving average of daily use with a time constant of
+# FOOD_BURN_RATE_WINDOW_DAYS. Each feeding adds its amount spread over the window, and the rate decays
+# between feedings, so it only ever needs the stored rate, its timestamp and the new feeding.
+
+# Helper function to find how much a rate has decayed between two times
+def _decay(since, now):
+    days = max((now - since).total_seconds(), 0) / 86400
+    return math.exp(-days / settings.FOOD_BURN_RATE_WINDOW_DAYS)
+
+# Return a food's burn rate in its own unit per day as of now
+def current_burn_rate(food, now=None):
+    if not food.burn_rate or food.burn_updated_at is None:
+        return 0.0
+    return food.burn_rate * _decay(food.burn_updated_at, now or timezone.now())
+
+# Return a burn rate in one unit as the same rate in another, weighing volumes with a density like
+# canonical grams do. Returns 0 when either unit is unknown.
+def convert_burn_rate(rate, from_unit, to_unit, density=None):
+    grams = convert_to_canonical_grams(rate, from_unit, density)
+    unit_grams = convert_to_canonical_grams(1, to_unit, density)
+    if grams is None or not unit_grams:
+        return 0.0
+    return grams / unit_grams
+
+# Raised when other feedings kept moving a food's burn rate through every try at taking its stock
+class StockContention(Exception):
+    pass
+
+# Take an amount out of a food's stock and add it to the burn rate with one conditional UPDATE.
+# The decrement is an F() expression guarded by amount >= the amount taken, and the burn rate is only
+# written over the value it was computed from, so parallel feedings never lose an update. Another feeding
+# moving the rate first costs a retry, up to FOOD_STOCK_RETRIES times. Returns False, changing nothing,
+# when there isn't enough left, and raises StockContention when the retries run out. Raises ValueError
+# for a NaN or infinite amount, which no stock level compares with.
+def take_from_stock(food, amount, now=None):
+    if not math.isfinite(amount):
+        raise ValueError(f'amount must be a finite number, not {amount}')
+
+    now = now or timezone.now()
+    for attempt in range(settings.FOOD_STOCK_RETRIES):
+        rate = current_burn_rate(food, now) + amount / settings.FOOD_BURN_RATE_WINDOW_DAYS
+        taken = Food.objects.filter(id=food.id, amount__gte=amount, burn_updated_at=food.burn_updated_at).update(
+            amount=F('amount') - amount, burn_rate=rate, burn_updated_at=now,
+        )
+        if taken:
+            food.amount -= amount
+            food.burn_rate, food.burn_updated_at = rate, now
+            return True
+
+        # Either the stock ran short or the burn rate moved, so look again
+        current = Food.objects.filter(id=food.id).values('amount', 'burn_rate', 'burn_updated_at').first()
+        if current is None or current['amount'] is None or current['amount'] < amount:
+            return False
+        food.amount, food.burn_rate, food.burn_updated_at = current['amount'], current['burn_rate'], current['burn_updated_at']
+    raise StockContention(f'{food.name} is being fed from right now')
+
+# Return how many days a food lasts at its current burn rate, None when it isn't being used
+def days_until_empty(food, now=None):
+    rate = current_burn_rate(food, now)
+    if rate <= 0 or food.amount is None:
+        return None
+    return max(food.amount, 0) / rate
+
+# -----------------------------
+# Low-stock alerts
+# -----------------------------
+
+# Notify owners once about each food forecast to run out within FOOD_LOW_STOCK_DAYS, in one batched pass.
+# The stored rate only decays, so the database filters on it first and only those candidates are
+# checked against the decayed rate. Returns how many alerts were sent.
+def notify_low_stock(now=None):
+    now = now or timezone.now()
+    threshold = settings.FOOD_LOW_STOCK_DAYS
+
+    candidates = Food.objects.filter(low_stock_notified=False, burn_rate__gt=0, amount__lt=F('burn_rate') * threshold)
+    low = []
+    for food in candidates.only('id', 'owner_id', 'name', 'amount', 'unit', 'burn_rate', 'burn_updated_at').iterator():
+        days = days_until_empty(food, now)
+        if days is not None and days < threshold:
+            low.append((food, days))
+    if not low:
+        return 0
+
+    with transaction.atomic():
+        # Skip foods restocked or already notified since they were read
+        flagged = set(Food.objects.filter(id__in=[food.id for food, days in low], low_stock_notified=False)
+                      .select_for_update().values_list('id', flat=True))
+        notifications = [
+            Notification(owner_id=food.owner_id, message=_low_stock_message(food, days), created_at=now)
+            for food, days in low if food.id in flagged
+        ]
+        Food.objects.filter(id__in=flagged).update(low_stock_notified=True)
+        Notification.objects.bulk_create(notifications)
+
+        transaction.on_commit(lambda: invalidate_unread(notification.owner_id for notification in notifications))
+        transaction.on_commit(lambda: publish_notifications(notifications))
+
+    return len(notifications)
+
+# Helper function to word a low-stock alert
+def _low_stock_message(food, days):
+    if food.amount <= 0:
+        return f'{food.name} has run out'
+    if days < 1:
+        return f'{food.name} will run out within a day ({food.amount:g} {food.unit} left)'
+    return f'{food.name} will run out in about {days:.0f} days ({food.amount:g} {food.unit} left)'
+
+# -----------------------------
+# Seeding
+# -----------------------------
+
+# Recompute burn rates from the daily feeding rollups, for everyone or only the given users.
+# Only the days that still carry weight are read. Returns how many foods were updated.
+def seed_burn_rates(owner_ids=None, now=None):
+    now = now or timezone.now()
+    since = timezone.localdate(now) - timedelta(days=settings.FOOD_BURN_RATE_WINDOW_DAYS * 5)
+
+    foods = Food.objects.all()
+    rollups = DailyFeedingRollup.objects.filter(day__gte=since, food__isnull=False)
+    if owner_ids is not None:
+        foods = foods.filter(owner_id__in=owner_ids)
+        rollups = rollups.filter(owner_id__in=owner_ids)
+
+    daily = defaultdict(list)
+    for food_id, day, grams, ml in rollups.values('food_id', 'day').annotate(grams=Sum('total_grams'), ml=Sum('total_ml')).values_list('food_id', 'day', 'grams', 'ml'):
+        daily[food_id].append((day, grams, ml))
+
+    updated = []
+    for food in foods.only('id', 'unit').iterator():
+        food.burn_rate = 0.0
+        food.burn_updated_at = now
+        for day, grams, ml in daily.get(food.id, ()):
+            # Back to the food's own unit, counted at midday of the local day
+            if food.unit in GRAM_CONVERSION:
+                amount = grams / GRAM_CONVERSION[food.unit]
+            elif food.unit in VOLUME_CONVERSION:
+                amount = ml / VOLUME_CONVERSION[food.unit]
+            else:
+                continue
+            fed_at = timezone.make_aware(datetime.combine(day, time(12)))
+            food.burn_rate += amount / settings.FOOD_BURN_RATE_WINDOW_DAYS * _decay(fed_at, now)
+        updated.append(food)
+
+    Food.objects.bulk_update(updated, ['burn_rate', 'burn_updated_at'], batch_size=1000)
+    return len(updated)
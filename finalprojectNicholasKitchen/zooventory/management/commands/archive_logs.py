@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from zooventory.archive import archive_horizon, archive_logs
+
+
+class Command(BaseCommand):
+    help = 'Move logs from before the archive horizon to the archive table, a chunk at a time.'
+
+    def handle(self, *args, **options):
+        moved = archive_logs()
+
+        self.stdout.write(f'Horizon: {archive_horizon():%Y-%m-%d %H:%M %Z} ({settings.LOG_ARCHIVE_AFTER_DAYS} days)')
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} logs to the archive.'))
@@ -0,0 +1,142 @@
+import random
+import timeit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from datetime import date, timedelta
+from zooventory.utils.downsample import downsample_matrix
+from zooventory.utils.series import forward_filled_matrix, matrix_to_lists, weight_in_pounds
+
+# -----------------------------
+# Baseline: the Python loops the weight trend chart used before
+# -----------------------------
+
+# Build the per-animal lists row by row and forward-fill them cell by cell
+def loop_series(rows, all_buckets):
+    index_of = {bucket: i for i, bucket in enumerate(all_buckets)}
+    data = {}
+
+    for name, bucket, lb, oz in rows:
+        weight = (lb or 0) + ((oz or 0) / 16)
+        if name not in data:
+            data[name] = [None] * len(all_buckets)
+        index = index_of.get(bucket)
+        if index is not None:
+            data[name][index] = weight
+
+    for name, values in data.items():
+        last_value = None
+        for i in range(len(all_buckets)):
+            if values[i] is None:
+                values[i] = last_value
+            else:
+                last_value = values[i]
+
+    return data
+
+# Largest-Triangle-Three-Buckets one series and one point at a time
+def loop_lttb(points, threshold):
+    count = len(points)
+    if threshold >= count:
+        return list(range(count))
+    if threshold < 3:
+        return [0, count - 1][:max(threshold, 0)]
+
+    kept = [0]
+    bucket_size = (count - 2) / (threshold - 2)
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_start, next_end = end, min(int((i + 2) * bucket_size) + 1, count)
+        if next_start >= next_end:
+            next_start, next_end = count - 1, count
+        avg_x = sum(points[j][0] for j in range(next_start, next_end)) / (next_end - next_start)
+        avg_y = sum(points[j][1] for j in range(next_start, next_end)) / (next_end - next_start)
+
+        prev_x, prev_y = points[kept[-1]]
+        best, best_area = start, -1
+        for j in range(start, end):
+            area = abs((prev_x - avg_x) * (points[j][1] - prev_y) - (prev_x - points[j][0]) * (avg_y - prev_y))
+            if area > best_area:
+                best, best_area = j, area
+        kept.append(best)
+
+    kept.append(count - 1)
+    return kept
+
+# Thin the lists out to a shared set of labels, picking each series' points with loop_lttb
+def loop_downsample(labels, series, max_points):
+    if len(labels) <= max_points or not series:
+        return labels, series
+
+    share = max(max_points // len(series), 3)
+    kept = set()
+    for values in series.values():
+        present = [i for i, value in enumerate(values) if value is not None]
+        kept.update(present[j] for j in loop_lttb([(i, values[i]) for i in present], share))
+
+    kept = sorted(kept)
+    return [labels[i] for i in kept], {name: [values[i] for i in kept] for name, values in series.items()}
+
+# -----------------------------
+# NumPy helpers
+# -----------------------------
+
+def array_series(rows, all_buckets):
+    names, buckets, lb, oz = zip(*rows)
+    names, matrix = forward_filled_matrix(names, buckets, weight_in_pounds(lb, oz), all_buckets)
+    return names, matrix
+
+
+class Command(BaseCommand):
+    help = 'Time the NumPy weight series builder and downsampling against the old Python loops on synthetic weigh-ins.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--animals', type=int, default=50, help='Number of animals.')
+        parser.add_argument('--days', type=int, default=365, help='Number of daily buckets.')
+        parser.add_argument('--density', type=float, default=0.3, help='Share of days with a weigh-in.')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per builder, the best one is reported.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the weigh-ins.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = date.today() - timedelta(days=options['days'] - 1)
+        all_buckets = [start + timedelta(days=i) for i in range(options['days'])]
+        labels = [bucket.strftime('%Y-%m-%d') for bucket in all_buckets]
+        rows = [
+            (f'Animal {animal}', bucket, rng.randint(1, 40), rng.randint(0, 15))
+            for animal in range(options['animals'])
+            for bucket in all_buckets
+            if rng.random() < options['density']
+        ]
+        if not rows:
+            raise CommandError('No weigh-ins were generated, raise --density or --days.')
+
+        names, matrix = array_series(rows, all_buckets)
+        if loop_series(rows, all_buckets) != dict(zip(names, matrix_to_lists(matrix))):
+            raise CommandError('The NumPy builder does not match the loop.')
+
+        # Building the series, then building and downsampling them for a chart
+        max_points = settings.CHART_MAX_POINTS
+
+        def loop_chart():
+            return loop_downsample(labels, loop_series(rows, all_buckets), max_points)
+
+        def array_chart():
+            names, matrix = array_series(rows, all_buckets)
+            chart_labels, matrix = downsample_matrix(labels, matrix, max_points)
+            return chart_labels, dict(zip(names, matrix_to_lists(matrix)))
+
+        def best(func):
+            return min(timeit.repeat(func, number=1, repeat=options['repeat'])) * 1000
+
+        timings = [
+            ('Build series', best(lambda: loop_series(rows, all_buckets)), best(lambda: matrix_to_lists(array_series(rows, all_buckets)[1]))),
+            (f'Build + downsample to {max_points}', best(loop_chart), best(array_chart)),
+        ]
+
+        self.stdout.write(f"Rows:  {len(rows)} weigh-ins, {options['animals']} animals x {options['days']} buckets")
+        self.stdout.write(f"{'':<30}{'Loop':>10}{'NumPy':>10}{'Speed-up':>10}")
+        for name, loop, array in timings:
+            self.stdout.write(f'{name:<30}{loop:>8.2f}ms{array:>8.2f}ms{loop / array:>9.1f}x')
+        self.stdout.write(self.style.SUCCESS('Built series match the loop.'))
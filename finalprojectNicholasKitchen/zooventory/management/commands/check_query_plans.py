@@ -0,0 +1,113 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q, Sum
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from zooventory.models import MyAnimal, Food, FeedingSchedule, Log, LogArchive, DailyFeedingRollup, Notification
+from zooventory.rollups import rebuild_feeding_rollups
+from zooventory.utils.scratch import scratch_database
+
+# Plan lines that mean a whole table is read
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)\b(?! USING)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Seed a large dataset in a scratch database and fail if any hot query is planned as a full table scan.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000, help='Notifications and logs to seed.')
+        parser.add_argument('--users', type=int, default=50, help='Users to spread the rows over.')
+
+    def handle(self, *args, **options):
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'Query plan checks are not supported on {connection.vendor}.')
+
+        with scratch_database():
+            user = self.seed(options['rows'], options['users'])
+
+            failures = []
+            for name, queryset in self.hot_queries(user):
+                plan = queryset.explain()
+                full_scans = pattern.findall(plan)
+                if full_scans:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f'FULL SCAN  {name} ({", ".join(full_scans)})'))
+                    self.stdout.write(plan)
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'OK         {name}'))
+                    if options['verbosity'] > 1:
+                        self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f'{len(failures)} hot queries use a full table scan: {", ".join(failures)}')
+
+    # The queries that run on every tick or page view
+    def hot_queries(self, user):
+        now = timezone.now()
+        start_date = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=29), time.min))
+        return [
+            ('scheduler due schedules', FeedingSchedule.objects.filter(next_run__lte=now).order_by('next_run', 'id').values_list('next_run', 'id')[:500]),
+            ('navbar unread notifications', Notification.objects.filter(owner=user, is_read=False).order_by('-created_at')[:5]),
+            ('notification history', Notification.objects.filter(owner=user).order_by('-created_at', '-id')[:11]),
+            ('notification history page', Notification.objects.filter(owner=user).filter(Q(created_at__lt=now) | Q(id__lt=0), created_at__lte=now)
+                .order_by('-created_at', '-id')[:11]),
+            ('unread notification history page', Notification.objects.filter(owner=user, is_read=False)
+                .filter(Q(created_at__lt=now) | Q(id__lt=0), created_at__lte=now).order_by('-created_at', '-id')[:11]),
+            ('chart food usage', DailyFeedingRollup.objects.filter(owner=user, day__gte=start_date.date())
+                .values('day').annotate(total=Sum('total_grams')).order_by('day')),
+            ('chart feeding frequency', DailyFeedingRollup.objects.filter(owner=user, day__gte=start_date.date())
+                .values('myanimal__name').annotate(count=Sum('feed_count')).order_by('myanimal__name')),
+            ('chart top food', DailyFeedingRollup.objects.filter(owner=user, day__gte=start_date.date())
+                .values('food__name').annotate(amount=Sum('total_canonical_grams')).order_by('-amount', 'food__name')[:5]),
+            ('chart etag latest log', Log.objects.filter(owner=user).order_by('-id').values_list('id', flat=True)[:1]),
+            ('chart weight trends', Log.objects.filter(owner=user, log_type=Log.WEIGHT_UPDATE, created_at__gte=start_date)
+                .values('myanimal__name', 'weight_lb', 'weight_oz')),
+            ('archived chart weight trends', LogArchive.objects.filter(owner=user, log_type=Log.WEIGHT_UPDATE, created_at__gte=start_date)
+                .values('myanimal__name', 'weight_lb', 'weight_oz')),
+            ('log archive chunk', Log.objects.filter(id__gt=0).order_by('id').values_list('id', 'created_at')[:1000]),
+        ]
+
+    # Spread notifications, logs and schedules over a number of users, then refresh planner statistics
+    def seed(self, rows, users):
+        User = get_user_model()
+        owners = User.objects.bulk_create([User(username=f'plan_{i}') for i in range(users)])
+        animals = MyAnimal.objects.bulk_create([
+            MyAnimal(owner=owners[i % users], name=f'Animal {i}', species='Plan') for i in range(users * 10)
+        ])
+        foods = Food.objects.bulk_create([Food(owner=owner, name='Food', amount=100) for owner in owners])
+
+        now = timezone.now()
+        FeedingSchedule.objects.bulk_create([
+            FeedingSchedule(myanimal=animal, frequency=FeedingSchedule.EVERY_X_HOURS, hours_interval=2,
+                            next_run=now + timedelta(minutes=i % 1440))
+            for i, animal in enumerate(animals)
+        ], batch_size=1000)
+        Notification.objects.bulk_create([
+            Notification(owner=owners[i % users], message='Plan check', is_read=i % 10 != 0) for i in range(rows)
+        ], batch_size=1000)
+        # Archived logs a year back, with ids below the live ones like the archive job leaves them
+        archived_at = now - timedelta(days=400)
+        LogArchive.objects.bulk_create([
+            LogArchive(id=1 + i, owner=animals[i % len(animals)].owner, myanimal=animals[i % len(animals)], food=foods[i % users],
+                       log_type=Log.FEEDING if i % 3 else Log.WEIGHT_UPDATE, amount_fed=1, converted_amount_grams=1, created_at=archived_at)
+            for i in range(rows)
+        ], batch_size=1000)
+        Log.objects.bulk_create([
+            Log(id=rows + 1 + i, owner=animals[i % len(animals)].owner, myanimal=animals[i % len(animals)], food=foods[i % users],
+                log_type=Log.FEEDING if i % 3 else Log.WEIGHT_UPDATE, amount_fed=1, converted_amount_grams=1)
+            for i in range(rows)
+        ], batch_size=1000)
+
+        rebuild_feeding_rollups()
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        return owners[0]
@@ -0,0 +1,37 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from zooventory.exports import EXPORT_FORMATS, export_blocks, export_filters, export_rows
+from zooventory.models import Log
+
+
+class Command(BaseCommand):
+    help = "Stream one user's logs as CSV or NDJSON, oldest first, to a file or standard output."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, dest='username', metavar='USERNAME', help='Owner of the logs.')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--start', help='First local date to include, like 2025-01-31.')
+        parser.add_argument('--end', help='Last local date to include, like 2025-12-31.')
+        parser.add_argument('--type', action='append', dest='log_types', choices=[choice for choice, label in Log.LOG_TYPE_CHOICES],
+                            help='Only export this log type. Can be given more than once.')
+        parser.add_argument('--output', help='File to write. Standard output when left out.')
+
+    def handle(self, *args, **options):
+        owner = get_user_model().objects.filter(username=options['username']).first()
+        if owner is None:
+            raise CommandError(f"Unknown user: {options['username']}")
+
+        try:
+            filters = export_filters(options['start'], options['end'], options['log_types'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        blocks = export_blocks(export_rows(owner.id, filters), options['format'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(blocks)
+            self.stderr.write(self.style.SUCCESS(f"Exported to {options['output']}"))
+        else:
+            sys.stdout.writelines(blocks)
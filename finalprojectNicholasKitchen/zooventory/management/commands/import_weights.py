@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from zooventory.imports import WEIGHT_FORMATS, format_for, import_weights
+
+
+class Command(BaseCommand):
+    help = 'Import weigh-ins for one user from a CSV or NDJSON file, a chunk at a time. Rows with problems are skipped and listed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row, or NDJSON file with one object per line.')
+        parser.add_argument('--user', required=True, dest='username', metavar='USERNAME', help='Owner of the animals being weighed.')
+        parser.add_argument('--format', choices=WEIGHT_FORMATS, help='File format. Worked out from the file name when left out.')
+        parser.add_argument('--chunk-size', type=int, help='Rows written per transaction. Defaults to IMPORT_CHUNK_SIZE.')
+
+    def handle(self, *args, **options):
+        owner = get_user_model().objects.filter(username=options['username']).first()
+        if owner is None:
+            raise CommandError(f"Unknown user: {options['username']}")
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as lines:
+                result = import_weights(owner, lines, options['format'] or format_for(options['path']), options['chunk_size'])
+        except OSError as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+        except UnicodeDecodeError:
+            raise CommandError('The file must be UTF-8 text. Rows before the bad text were imported.')
+
+        for line_number, error in result['errors']:
+            self.stderr.write(f'Line {line_number}: {error}')
+        if result['failed'] > len(result['errors']):
+            self.stderr.write(f"...and {result['failed'] - len(result['errors'])} more skipped rows.")
+        self.stdout.write(self.style.SUCCESS(f"Imported {result['imported']} weigh-ins, skipped {result['failed']} rows."))
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from zooventory.inventory import seed_burn_rates
+from zooventory.rollups import rebuild_feeding_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily feeding rollups used by the dashboard charts from the feeding logs, filling in missing canonical grams first, and reseed the food burn rates from them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help='Only rebuild this user. Can be given more than once.')
+
+    def handle(self, *args, **options):
+        owner_ids = None
+        if options['usernames']:
+            users = dict(get_user_model().objects.filter(username__in=options['usernames']).values_list('username', 'id'))
+            missing = set(options['usernames']) - set(users)
+            if missing:
+                raise CommandError(f"Unknown users: {', '.join(sorted(missing))}")
+            owner_ids = list(users.values())
+
+        backfilled, written = rebuild_feeding_rollups(owner_ids)
+        if backfilled:
+            self.stdout.write(f'Filled in canonical grams on {backfilled} older feeding logs.')
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} daily feeding rollups.'))
+
+        seeded = seed_burn_rates(owner_ids)
+        self.stdout.write(self.style.SUCCESS(f'Reseeded the burn rates of {seeded} foods.'))
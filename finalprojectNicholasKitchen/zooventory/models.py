@@ -88,6 +88,13 @@ class Food(models.Model):
     name = models.CharField(max_length=100)
     amount = models.FloatField(null=True, blank=True)  # CHECK (amount >= 0)
     unit = models.CharField(max_length=20, choices=UNIT_CHOICES, default=POUND)
+    density = models.FloatField(null=True, blank=True)  # g/ml, used to weigh liquids. Water (1.0) when blank
+
+    # Forecast of when the food runs out, kept up to date as animals are fed.
+    # burn_rate is the recent daily use in the food's own unit as of burn_updated_at.
+    burn_rate = models.FloatField(default=0)
+    burn_updated_at = models.DateTimeField(null=True, blank=True)
+    low_stock_notified = models.BooleanField(default=False)  # Cleared when the food is restocked
 
     def __str__(self):
         return f"{self.name} - {self.amount} {self.unit}"
@@ -125,6 +132,12 @@ class FeedingSchedule(models.Model):
     def __str__(self):
         return f"{self.myanimal.name}'s next feeding is at {self.next_run}"
 
+    class Meta:
+        indexes = [
+            # Scheduler scan for due schedules, paged by (next_run, id)
+            models.Index(fields=['next_run', 'id'], name='schedule_next_run_idx'),
+        ]
+
 # --- Log model ---
 class Log(models.Model):
     # Log Types
@@ -154,6 +167,9 @@ class Log(models.Model):
     converted_amount_grams = models.FloatField(null=True, blank=True)
     converted_amount_ml = models.FloatField(null=True, blank=True)
 
+    # Every feeding in grams, liquids weighed with the food's density at the time, so foods can be ranked together
+    canonical_grams = models.FloatField(null=True, blank=True)
+
     weight_lb = models.PositiveIntegerField(null=True, blank=True)
     weight_oz = models.PositiveIntegerField(null=True, blank=True)
 
@@ -162,6 +178,68 @@ class Log(models.Model):
     def __str__(self):
         return f"{self.myanimal.name} - {self.log_type} ({self.created_at:%m-%d-%Y %H:%M})"
 
+    class Meta:
+        indexes = [
+            # Chart filters on owner, log type and a start date
+            models.Index(fields=['owner', 'log_type', 'created_at'], name='log_owner_type_created_idx'),
+        ]
+
+# --- Log Archive model ---
+class LogArchive(models.Model):
+    # Logs older than LOG_ARCHIVE_AFTER_DAYS, moved out of the Log table by the archive job so the
+    # table and its indexes stay small. Same columns and ids as Log, with created_at kept as it was.
+    id = models.BigIntegerField(primary_key=True)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_logs')
+    myanimal = models.ForeignKey(MyAnimal, on_delete=models.CASCADE, related_name='archived_logs')
+    food = models.ForeignKey(Food, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_logs')
+    log_type = models.CharField(max_length=50, choices=Log.LOG_TYPE_CHOICES, default=Log.FEEDING)
+    description = models.TextField(null=True, blank=True)
+
+    amount_fed = models.FloatField(null=True, blank=True)
+    unit = models.TextField(null=True, blank=True)
+    converted_amount_grams = models.FloatField(null=True, blank=True)
+    converted_amount_ml = models.FloatField(null=True, blank=True)
+    canonical_grams = models.FloatField(null=True, blank=True)
+
+    weight_lb = models.PositiveIntegerField(null=True, blank=True)
+    weight_oz = models.PositiveIntegerField(null=True, blank=True)
+
+    created_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.myanimal.name} - {self.log_type} ({self.created_at:%m-%d-%Y %H:%M}, archived)"
+
+    class Meta:
+        verbose_name = 'Archived Log'
+        verbose_name_plural = 'Archived Logs'
+        indexes = [
+            # Full-history charts and exports filter on owner, log type and a start date like the Log table
+            models.Index(fields=['owner', 'log_type', 'created_at'], name='archive_owner_type_created_idx'),
+        ]
+
+# --- Daily Feeding Rollup model ---
+class DailyFeedingRollup(models.Model):
+    # Feeding logs summed per animal, food and local day, kept up to date as animals are fed.
+    # The charts read these rows instead of re-aggregating the whole log history.
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='feeding_rollups')
+    myanimal = models.ForeignKey(MyAnimal, on_delete=models.CASCADE, related_name='feeding_rollups')
+    food = models.ForeignKey(Food, on_delete=models.SET_NULL, null=True, blank=True, related_name='feeding_rollups')
+    day = models.DateField()
+
+    total_grams = models.FloatField(default=0)
+    total_ml = models.FloatField(default=0)
+    total_canonical_grams = models.FloatField(default=0)
+    feed_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.myanimal.name} - {self.day} ({self.feed_count} feedings)"
+
+    class Meta:
+        constraints = [
+            # One row per animal, food and day. Also serves the charts' owner and date range filter.
+            models.UniqueConstraint(fields=['owner', 'day', 'myanimal', 'food'], name='rollup_owner_day_unique'),
+        ]
+
 # --- Notification Model ---
 class Notification(models.Model):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
@@ -169,5 +247,23 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    # Feeding reminders for the same schedule are folded into one unread notification.
+    # created_at is moved to the latest reminder and occurrences counts them.
+    schedule = models.ForeignKey(FeedingSchedule, on_delete=models.SET_NULL, null=True, blank=True, related_name='notifications')
+    occurrences = models.PositiveIntegerField(default=1)
+
     def __str__(self):
-        return f"{self.owner.username} - {self.message}"
\ No newline at end of file
+        return f"{self.owner.username} - {self.message}"
+
+    class Meta:
+        indexes = [
+            # Notification history, newest first
+            models.Index(fields=['owner', '-created_at', '-id'], name='notification_owner_recent_idx'),
+            # Unread notifications for the navbar and the unread-only history. Only created on backends
+            # with partial indexes, the others use the history index above.
+            models.Index(fields=['owner', '-created_at', '-id'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+        ]
+        constraints = [
+            # At most one unread reminder per feeding schedule
+            models.UniqueConstraint(fields=['schedule'], condition=models.Q(is_read=False), name='notification_unread_schedule_unique'),
+        ]
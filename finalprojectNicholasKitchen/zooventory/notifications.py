@@ -0,0 +1,41 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from .models import Notification
+
+# Helper function to build the cache key for a user's unread summary
+def _unread_key(owner_id):
+    return f'unread_notifications:{owner_id}'
+
+# Helper function to build the cache key for a user's unread version
+def _version_key(owner_id):
+    return f'unread_notifications_version:{owner_id}'
+
+# Return a token that changes whenever a user's unread notifications change, in any process sharing the cache.
+# Open event streams poll it to pick up notifications written by a scheduler running in another process.
+def unread_version(owner_id):
+    return cache.get(_version_key(owner_id))
+
+# Return a user's unread count and 5 most recent unread notifications, from the cache when possible
+def unread_summary(owner_id):
+    summary = cache.get(_unread_key(owner_id))
+
+    if summary is None:
+        unread = Notification.objects.filter(owner_id=owner_id, is_read=False)
+        recent = list(unread.order_by('-created_at').values('id', 'message', 'created_at', 'occurrences', 'is_read')[:5])
+
+        # Fewer than 5 recent means that is the whole count, so skip the COUNT query
+        count = len(recent) if len(recent) < 5 else unread.count()
+
+        summary = {'count': count, 'recent': recent}
+        cache.set(_unread_key(owner_id), summary, settings.UNREAD_NOTIFICATIONS_CACHE_SECONDS)
+
+    return summary
+
+# Drop the cached summaries for these users after their unread notifications change, and move their versions on
+def invalidate_unread(owner_ids):
+    owner_ids = set(owner_ids)
+    cache.delete_many([_unread_key(owner_id) for owner_id in owner_ids])
+    version = uuid.uuid4().hex
+    cache.set_many({_version_key(owner_id): version for owner_id in owner_ids}, None)
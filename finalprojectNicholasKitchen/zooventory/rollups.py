@@ -0,0 +1,124 @@
+from collections import defaultdict
+from itertools import groupby
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from .archive import log_models, merged_rows
+from .models import DailyFeedingRollup, Food, Log
+
+# Fields of the rollup key, in the order they are grouped by
+ROLLUP_KEY = ('owner_id', 'myanimal_id', 'food_id', 'day')
+
+# Fields of a rollup that are added up
+ROLLUP_TOTALS = ('total_grams', 'total_ml', 'total_canonical_grams', 'feed_count')
+
+# Add freshly written feeding logs to their daily rollups.
+# Must run in the same transaction as the log inserts so the two never disagree.
+def record_feedings(logs):
+    totals = defaultdict(lambda: {'total_grams': 0, 'total_ml': 0, 'total_canonical_grams': 0, 'feed_count': 0})
+    for log in logs:
+        key = (log.owner_id, log.myanimal_id, log.food_id, timezone.localdate(log.created_at))
+        totals[key]['total_grams'] += log.converted_amount_grams or 0
+        totals[key]['total_ml'] += log.converted_amount_ml or 0
+        totals[key]['total_canonical_grams'] += log.canonical_grams or 0
+        totals[key]['feed_count'] += 1
+
+    # A single feeding touches one row, a batch of feedings many
+    if len(totals) == 1:
+        key, total = next(iter(totals.items()))
+        _add_to_rollup(dict(zip(ROLLUP_KEY, key)), total)
+    elif totals:
+        _add_to_rollups(totals)
+
+# Helper function to add to one rollup row, creating it on the first feeding of the day
+def _add_to_rollup(key, total):
+    increments = {field: F(field) + value for field, value in total.items()}
+    if DailyFeedingRollup.objects.filter(**key).update(**increments):
+        return
+
+    # Another request may create the same row first, in which case add to theirs
+    try:
+        with transaction.atomic():
+            DailyFeedingRollup.objects.create(**key, **total)
+    except IntegrityError:
+        DailyFeedingRollup.objects.filter(**key).update(**increments)
+
+# Helper function to add to many rollup rows in three queries, however many there are: create the
+# missing rows empty, ignoring any another request just created, load them all, then add to them in one UPDATE
+def _add_to_rollups(totals):
+    DailyFeedingRollup.objects.bulk_create(
+        [DailyFeedingRollup(**dict(zip(ROLLUP_KEY, key))) for key in totals], ignore_conflicts=True,
+    )
+
+    owner_ids, myanimal_ids, food_ids, days = (set(values) for values in zip(*totals))
+    rows = DailyFeedingRollup.objects.filter(owner_id__in=owner_ids, myanimal_id__in=myanimal_ids, food_id__in=food_ids, day__in=days)
+
+    rollups = []
+    for rollup in rows.only('id', *ROLLUP_KEY):
+        total = totals.get(tuple(getattr(rollup, field) for field in ROLLUP_KEY))
+        if total:
+            for field, value in total.items():
+                setattr(rollup, field, F(field) + value)
+            rollups.append(rollup)
+    DailyFeedingRollup.objects.bulk_update(rollups, ROLLUP_TOTALS)
+
+# Fill in the canonical grams of feeding logs written before it was stored, weighing liquids with
+# their food's current density. Returns how many logs were filled in.
+def backfill_canonical_grams(logs):
+    density = Food.objects.filter(id=OuterRef('food_id')).values('density')[:1]
+    return logs.filter(log_type=Log.FEEDING, canonical_grams__isnull=True).update(
+        canonical_grams=Coalesce('converted_amount_grams', F('converted_amount_ml') * Coalesce(Subquery(density), Value(1.0)))
+    )
+
+# Recompute the rollups from the feeding logs, archived ones included, for everyone or only the given users.
+# Returns how many logs had their canonical grams filled in and how many rollup rows were written.
+def rebuild_feeding_rollups(owner_ids=None, batch_size=1000):
+    rollups = DailyFeedingRollup.objects.all()
+    if owner_ids is not None:
+        rollups = rollups.filter(owner_id__in=owner_ids)
+
+    backfilled = 0
+    grouped = []
+    for model in log_models():
+        logs = model.objects.filter(log_type=Log.FEEDING)
+        if owner_ids is not None:
+            logs = logs.filter(owner_id__in=owner_ids)
+        backfilled += backfill_canonical_grams(logs)
+
+        # Group by the local day, the same day record_feedings uses, in the same order for both tables
+        grouped.append(
+            logs.annotate(day=TruncDate('created_at'))
+            .values('owner_id', 'myanimal_id', 'food_id', 'day')
+            .annotate(
+                total_grams=Sum('converted_amount_grams'),
+                total_ml=Sum('converted_amount_ml'),
+                total_canonical_grams=Sum('canonical_grams'),
+                feed_count=Count('id'),
+            )
+            .order_by('owner_id', 'myanimal_id', F('food_id').asc(nulls_first=True), 'day')
+        )
+
+    written = 0
+    with transaction.atomic():
+        rollups.delete()
+
+        # A day the archive horizon cut through has a row from each table, next to each other in the merged stream
+        batch = []
+        rows = merged_rows(grouped, key=_rollup_order, chunk_size=batch_size)
+        for key, parts in groupby(rows, key=_rollup_order):
+            parts = list(parts)
+            row = {field: parts[0][field] for field in ROLLUP_KEY}
+            for field in ROLLUP_TOTALS:
+                row[field] = sum(part[field] or 0 for part in parts)
+            batch.append(DailyFeedingRollup(**row))
+            if len(batch) >= batch_size:
+                written += len(DailyFeedingRollup.objects.bulk_create(batch))
+                batch = []
+        written += len(DailyFeedingRollup.objects.bulk_create(batch))
+
+    return backfilled, written
+
+# Helper function to sort grouped rows the way the database does, with no food first
+def _rollup_order(row):
+    return (row['owner_id'], row['myanimal_id'], row['food_id'] is not None, row['food_id'] or 0, row['day'])
@@ -0,0 +1,601 @@
+import csv
+import json
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from unittest import mock
+from .archive import archive_logs
+from .charts import chart_window
+from .exports import EXPORT_COLUMNS, async_export_blocks, export_blocks, export_rows
+from .imports import import_weights
+from .inventory import StockContention, days_until_empty, notify_low_stock, take_from_stock
+from .models import DailyFeedingRollup, FeedingSchedule, Food, Log, LogArchive, MyAnimal, Notification
+from .notifications import invalidate_unread, unread_summary
+from .events import publish_notifications
+from .rollups import ROLLUP_KEY, ROLLUP_TOTALS, rebuild_feeding_rollups
+from .utils.pagination import decode_cursor, encode_cursor, keyset_page
+from .views import _notification_events, _weight_trends_series
+from scheduler.jobs import check_feeding_schedules
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create(username='keeper')
+        self.now = timezone.now().replace(microsecond=0)
+
+        # Twelve notifications a minute apart, the newest last
+        notifications = Notification.objects.bulk_create([Notification(owner=self.owner, message=f'Reminder {i}') for i in range(12)])
+        for i, notification in enumerate(notifications):
+            Notification.objects.filter(id=notification.id).update(created_at=self.now - timedelta(minutes=12 - i))
+        self.notifications = Notification.objects.filter(owner=self.owner)
+
+    # Helper function to list the messages on a page
+    def messages(self, page):
+        return [notification.message for notification in page['object_list']]
+
+    def test_cursor_round_trip(self):
+        created_at = self.now - timedelta(minutes=3)
+        self.assertEqual(decode_cursor(encode_cursor('next', created_at, 42)), ('next', created_at, 42))
+        self.assertEqual(decode_cursor(encode_cursor('previous', created_at, 7)), ('previous', created_at, 7))
+
+    def test_next_then_previous_returns_the_same_page(self):
+        first = keyset_page(self.notifications, None, 5)
+        self.assertEqual(self.messages(first), [f'Reminder {i}' for i in range(11, 6, -1)])
+        self.assertIsNone(first['previous'])
+
+        second = keyset_page(self.notifications, first['next'], 5)
+        self.assertEqual(self.messages(second), [f'Reminder {i}' for i in range(6, 1, -1)])
+
+        last = keyset_page(self.notifications, second['next'], 5)
+        self.assertEqual(self.messages(last), ['Reminder 1', 'Reminder 0'])
+        self.assertIsNone(last['next'])
+
+        self.assertEqual(self.messages(keyset_page(self.notifications, last['previous'], 5)), self.messages(second))
+        back = keyset_page(self.notifications, second['previous'], 5)
+        self.assertEqual(self.messages(back), self.messages(first))
+        self.assertIsNone(back['previous'])
+
+    # Rows sharing a created_at are ordered by id, so none are skipped or repeated across pages
+    def test_ties_on_created_at_are_broken_by_id(self):
+        self.notifications.update(created_at=self.now)
+        ids = sorted(self.notifications.values_list('id', flat=True), reverse=True)
+
+        seen = []
+        page = keyset_page(self.notifications, None, 5)
+        while True:
+            seen += [notification.id for notification in page['object_list']]
+            if page['next'] is None:
+                break
+            page = keyset_page(self.notifications, page['next'], 5)
+        self.assertEqual(seen, ids)
+
+        previous = keyset_page(self.notifications, page['previous'], 5)
+        self.assertEqual([notification.id for notification in previous['object_list']], ids[5:10])
+
+    # A token that can't be read is treated like no token at all
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        first = self.messages(keyset_page(self.notifications, None, 5))
+        token = encode_cursor('next', self.now, 5)
+
+        for bad in ('garbage', token[:-3] + '!!!', encode_cursor('sideways', self.now, 5), '====', 'bmV4dHxub3QgYSBkYXRlfDU'):
+            self.assertEqual(self.messages(keyset_page(self.notifications, bad, 5)), first, bad)
+
+    def test_notification_index_pages_with_cursor(self):
+        self.client.force_login(self.owner)
+        url = reverse('notification_index')
+        first = self.client.get(url).context['page']
+        second = self.client.get(url, {'cursor': first['next']}).context['page']
+
+        self.assertEqual(len(second['object_list']), 2)
+        self.assertEqual(self.client.get(url, {'cursor': 'tampered'}).context['page']['object_list'], first['object_list'])
+
+
+class FeedingRollupTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create(username='keeper')
+        self.client.force_login(self.owner)
+        self.rex = MyAnimal.objects.create(owner=self.owner, name='Rex', species='Dog')
+        self.tom = MyAnimal.objects.create(owner=self.owner, name='Tom', species='Cat')
+        self.kibble = Food.objects.create(owner=self.owner, name='Kibble', amount=1000, unit=Food.GRAM)
+        self.milk = Food.objects.create(owner=self.owner, name='Milk', amount=10, unit=Food.LITER, density=1.03)
+
+    # Helper function to sum rows per rollup key, skipping keys with nothing in them
+    def totals(self, rows):
+        totals = defaultdict(lambda: [0, 0, 0, 0])
+        for row in rows:
+            key = tuple(row[field] for field in ROLLUP_KEY)
+            for i, field in enumerate(ROLLUP_TOTALS):
+                totals[key][i] += row[field] or 0
+        return {key: [round(value, 6) for value in total] for key, total in totals.items() if total[3]}
+
+    # Check the rollups add up to the same totals as grouping the raw logs, archived ones included
+    def assertRollupsMatchLogs(self):
+        logs = []
+        for model in (LogArchive, Log):
+            logs += model.objects.filter(log_type=Log.FEEDING).annotate(day=TruncDate('created_at')).values(*ROLLUP_KEY).annotate(
+                total_grams=Sum('converted_amount_grams'),
+                total_ml=Sum('converted_amount_ml'),
+                total_canonical_grams=Sum('canonical_grams'),
+                feed_count=Count('id'),
+            ).order_by()
+        rollups = DailyFeedingRollup.objects.values(*ROLLUP_KEY, *ROLLUP_TOTALS)
+
+        self.assertEqual(self.totals(rollups), self.totals(logs))
+
+    # Helper function to feed one animal through the feed form
+    def feed(self, myanimal, food, amount):
+        self.client.post(reverse('feed_myanimal'), {'myanimal_id': myanimal.id, 'food_id': food.id, 'amount': amount, 'notes': ''})
+
+    def test_feed_edit_and_delete(self):
+        self.feed(self.rex, self.kibble, 100)
+        self.feed(self.rex, self.kibble, 50)
+        self.feed(self.tom, self.milk, 0.5)
+        self.feed(self.tom, self.kibble, 25)
+        self.assertEqual(Log.objects.count(), 4)
+        self.assertRollupsMatchLogs()
+
+        # Editing a food keeps the grams past feedings were logged with
+        self.client.post(reverse('food_update', args=[self.milk.id]), {'name': 'Goat Milk', 'amount': 20, 'unit': Food.GALLON, 'density': 1.1})
+        self.assertEqual(Food.objects.get(id=self.milk.id).unit, Food.GALLON)
+        self.assertRollupsMatchLogs()
+
+        # Deleting a food leaves its logs and rollups without one, deleting an animal takes both with it
+        self.client.post(reverse('food_delete', args=[self.kibble.id]))
+        self.assertRollupsMatchLogs()
+        self.client.post(reverse('myanimal_delete', args=[self.rex.id]))
+        self.assertEqual(Log.objects.count(), 2)
+        self.assertRollupsMatchLogs()
+
+    def test_batch_feeding(self):
+        self.feed(self.rex, self.kibble, 10)
+        self.client.post(reverse('feed_batch'), {
+            'myanimal_id': [self.rex.id, self.tom.id],
+            'food_id': [self.kibble.id, self.milk.id],
+            'amount': [40, 0.25],
+            'notes': ['', ''],
+        })
+        self.client.post(reverse('feed_batch'), {
+            'myanimal_id': [self.rex.id, self.tom.id],
+            'food_id': [self.milk.id, self.kibble.id],
+            'amount': [1, 15],
+            'notes': ['', ''],
+        })
+
+        self.assertEqual(Log.objects.count(), 5)
+        self.assertRollupsMatchLogs()
+
+    def test_batch_rejects_non_finite_amounts(self):
+        response = self.client.post(reverse('feed_batch'), {
+            'myanimal_id': [self.rex.id, self.tom.id],
+            'food_id': [self.kibble.id, self.kibble.id],
+            'amount': ['nan', 'inf'],
+            'notes': ['', ''],
+        })
+
+        self.assertEqual([str(message) for message in response.context['messages']], ['Amount for Rex must be a number.', 'Amount for Tom must be a number.'])
+        self.assertFalse(Log.objects.exists())
+        self.assertEqual(Food.objects.get(id=self.kibble.id).amount, 1000)
+
+    def test_archived_logs(self):
+        for amount in (10, 20, 30):
+            self.feed(self.rex, self.kibble, amount)
+        self.feed(self.tom, self.milk, 1)
+
+        # Age two of the feedings past the archive horizon and rebuild the rollups for them
+        old = list(Log.objects.order_by('id').values_list('id', flat=True)[:2])
+        Log.objects.filter(id__in=old).update(created_at=timezone.now() - timedelta(days=settings.LOG_ARCHIVE_AFTER_DAYS + 30))
+        rebuild_feeding_rollups()
+        self.assertRollupsMatchLogs()
+
+        self.assertEqual(archive_logs(), 2)
+        self.assertEqual(LogArchive.objects.count(), 2)
+        self.assertRollupsMatchLogs()
+
+        # A rebuild after archiving reads the archive too, and feeding carries on from there
+        rebuild_feeding_rollups()
+        self.feed(self.rex, self.kibble, 5)
+        self.assertRollupsMatchLogs()
+
+
+class WeightTrendsTests(TestCase):
+    # The range starts at local midnight of its first day, not at midnight UTC
+    def test_range_starts_at_local_midnight(self):
+        owner = get_user_model().objects.create(username='keeper')
+        rex = MyAnimal.objects.create(owner=owner, name='Rex', species='Dog')
+        window = chart_window(owner, {'range': '7d'})
+        midnight = timezone.make_aware(datetime.combine(window['start_date'], time.min))
+
+        for weight_lb, created_at in ((10, midnight - timedelta(minutes=30)), (12, midnight + timedelta(minutes=30))):
+            log = Log.objects.create(owner=owner, myanimal=rex, log_type=Log.WEIGHT_UPDATE, weight_lb=weight_lb, weight_oz=0)
+            Log.objects.filter(id=log.id).update(created_at=created_at)
+
+        series = _weight_trends_series(owner, window)
+        self.assertEqual(series['data']['Rex'][0], 12)
+
+
+class TakeFromStockTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create(username='keeper')
+        self.client.force_login(self.owner)
+        self.rex = MyAnimal.objects.create(owner=self.owner, name='Rex', species='Dog')
+        self.kibble = Food.objects.create(owner=self.owner, name='Kibble', amount=100, unit=Food.GRAM)
+
+    def test_non_finite_amount_is_rejected(self):
+        for amount in ('nan', 'inf', '-inf'):
+            response = self.client.post(reverse('feed_myanimal'), {'myanimal_id': self.rex.id, 'food_id': self.kibble.id, 'amount': amount, 'notes': ''})
+            self.assertEqual([str(message) for message in response.context['messages']], ['Amount must be a number.'])
+
+        self.assertFalse(Log.objects.exists())
+        self.assertEqual(Food.objects.get(id=self.kibble.id).amount, 100)
+        with self.assertRaises(ValueError):
+            take_from_stock(self.kibble, float('nan'))
+
+    # A burn rate that keeps moving under the feeding gives up after FOOD_STOCK_RETRIES tries
+    @override_settings(FOOD_STOCK_RETRIES=3)
+    def test_retries_are_capped(self):
+        # Another feeding moves the rate between each read and write
+        moves = []
+        def move_rate(food, now):
+            moves.append(now)
+            Food.objects.filter(id=food.id).update(burn_updated_at=now + timedelta(seconds=len(moves)))
+            return 0
+
+        with mock.patch('zooventory.inventory.current_burn_rate', move_rate), self.assertRaises(StockContention):
+            take_from_stock(self.kibble, 10)
+
+        self.assertEqual(len(moves), 3)
+        self.assertEqual(Food.objects.get(id=self.kibble.id).amount, 100)
+
+    # Running out of retries asks the keeper to try again instead of reporting the food as short
+    @override_settings(FOOD_STOCK_RETRIES=1)
+    def test_retries_running_out_asks_to_try_again(self):
+        def move_rate(food, now):
+            Food.objects.filter(id=food.id).update(burn_updated_at=now + timedelta(seconds=1))
+            return 0
+
+        with mock.patch('zooventory.inventory.current_burn_rate', move_rate):
+            response = self.client.post(reverse('feed_myanimal'), {'myanimal_id': self.rex.id, 'food_id': self.kibble.id, 'amount': 10, 'notes': ''}, follow=True)
+            self.assertEqual([str(message) for message in response.context['messages']], ['Kibble is being fed from right now. Please try again.'])
+
+            response = self.client.post(reverse('feed_batch'), {'myanimal_id': [self.rex.id], 'food_id': [self.kibble.id], 'amount': [10], 'notes': ['']})
+            self.assertEqual([str(message) for message in response.context['messages']], ['Kibble is being fed from right now. Please try again.'])
+
+        self.assertFalse(Log.objects.exists())
+        self.assertEqual(Food.objects.get(id=self.kibble.id).amount, 100)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'unread-tests'}})
+class UnreadSummaryTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create(username='keeper')
+        self.client.force_login(self.owner)
+        self.notifications = [Notification.objects.create(owner=self.owner, message=f'Reminder {i}') for i in range(3)]
+
+    def test_summary_is_cached(self):
+        self.assertEqual(unread_summary(self.owner.id)['count'], 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_summary(self.owner.id)['count'], 3)
+
+        # Changes that don't go through the invalidating paths wait for the safety expiry
+        Notification.objects.create(owner=self.owner, message='Unseen')
+        self.assertEqual(unread_summary(self.owner.id)['count'], 3)
+
+    def test_marking_read_invalidates(self):
+        unread_summary(self.owner.id)
+
+        self.client.get(reverse('notification_mark_one', args=[self.notifications[0].id]))
+        self.assertEqual(unread_summary(self.owner.id)['count'], 2)
+
+        self.client.get(reverse('notification_mark_read'))
+        self.assertEqual(unread_summary(self.owner.id), {'count': 0, 'recent': []})
+
+    def test_feeding_reminders_invalidate(self):
+        unread_summary(self.owner.id)
+        myanimal = MyAnimal.objects.create(owner=self.owner, name='Rex', species='Dog')
+        FeedingSchedule.objects.create(myanimal=myanimal, frequency=FeedingSchedule.EVERY_X_HOURS, hours_interval=2,
+                                       next_run=timezone.now() - timedelta(minutes=1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            check_feeding_schedules()
+
+        summary = unread_summary(self.owner.id)
+        self.assertEqual(summary['count'], 4)
+        self.assertEqual(summary['recent'][0]['message'], "It's time to feed Rex")
+
+    @override_settings(FOOD_LOW_STOCK_DAYS=7)
+    def test_low_stock_alerts_invalidate(self):
+        unread_summary(self.owner.id)
+        Food.objects.create(owner=self.owner, name='Kibble', amount=10, unit=Food.GRAM, burn_rate=5, burn_updated_at=timezone.now())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notify_low_stock()
+
+        self.assertEqual(unread_summary(self.owner.id)['count'], 4)
+
+    # Only the user whose notifications changed loses their cached summary
+    def test_other_users_stay_cached(self):
+        other = get_user_model().objects.create(username='other')
+        Notification.objects.create(owner=other, message='Reminder')
+        unread_summary(other.id)
+
+        self.client.get(reverse('notification_mark_read'))
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_summary(other.id)['count'], 1)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'stream-tests'}},
+                   NOTIFICATION_STREAM_POLL_SECONDS=0.01, NOTIFICATION_STREAM_KEEPALIVE_SECONDS=0.03)
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create(username='keeper')
+
+    # Helper function to write a reminder the way the scheduler does, optionally in another process
+    # that can only reach this one through the shared cache
+    def remind(self, message, publish=False):
+        notification = Notification.objects.create(owner=self.owner, message=message)
+        invalidate_unread([self.owner.id])
+        if publish:
+            publish_notifications([notification])
+        return notification
+
+    # Helper function to run a scenario against one open stream, collecting what it sends
+    def stream(self, scenario):
+        async def run():
+            events = _notification_events(self.owner.id)
+            try:
+                return await scenario(events)
+            finally:
+                await events.aclose()
+        return async_to_sync(run)()
+
+    def test_notifications_from_another_process(self):
+        async def scenario(events):
+            sent = [await events.__anext__()]
+            await sync_to_async(self.remind)('Feed Rex')
+            sent += [await events.__anext__(), await events.__anext__()]
+            return sent
+
+        opened, notification, unread = self.stream(scenario)
+        self.assertEqual(opened, 'event: unread\ndata: {"count": 0}\n\n')
+        self.assertTrue(notification.startswith('event: notification\n'))
+        self.assertIn('"message": "Feed Rex"', notification)
+        self.assertEqual(unread, 'event: unread\ndata: {"count": 1}\n\n')
+
+    # A notification published in this process is sent once, not again when the version moves
+    def test_notifications_from_this_process_are_sent_once(self):
+        async def scenario(events):
+            sent = [await events.__anext__()]
+            await sync_to_async(self.remind)('Feed Rex', publish=True)
+            sent += [await events.__anext__(), await events.__anext__(), await events.__anext__()]
+            return sent
+
+        opened, notification, unread, keepalive = self.stream(scenario)
+        self.assertIn('"message": "Feed Rex"', notification)
+        self.assertEqual(unread, 'event: unread\ndata: {"count": 1}\n\n')
+        self.assertEqual(keepalive, ': keepalive\n\n')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'chart-tests'}})
+class ChartCacheTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create(username='keeper')
+        self.client.force_login(self.owner)
+        self.url = reverse('chart_food_usage')
+
+    def test_unchanged_chart_is_not_modified(self):
+        response = self.client.get(self.url, {'range': '7d'})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(self.url, {'range': '7d'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    # Parameters are validated before the ETag is matched, so bad ones never get a 304
+    def test_invalid_parameters_are_rejected_before_the_etag(self):
+        etag = self.client.get(self.url, {'range': '7d'})['ETag']
+
+        for params in ({'range': 'forever'}, {'bucket': 'hour'}, {'n': '0'}):
+            response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_etag_follows_the_normalized_parameters(self):
+        etag = self.client.get(self.url, {'range': '30d'})['ETag']
+
+        self.assertEqual(self.client.get(self.url)['ETag'], etag)
+        self.assertEqual(self.client.get(self.url, {'range': '30d', 'bucket': 'day', 'n': '5'})['ETag'], etag)
+        self.assertNotEqual(self.client.get(self.url, {'range': '7d'})['ETag'], etag)
+        self.assertNotEqual(self.client.get(self.url, {'range': '30d', 'bucket': 'week'})['ETag'], etag)
+
+
+class FoodUnitChangeTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create(username='keeper')
+        self.client.force_login(self.owner)
+        self.now = timezone.now()
+
+    # Helper function to change a food's unit and amount through the edit form
+    def update(self, food, amount, unit, density=''):
+        self.client.post(reverse('food_update', args=[food.id]), {'name': food.name, 'amount': amount, 'unit': unit, 'density': density})
+        return Food.objects.get(id=food.id)
+
+    # The same stock in a new unit lasts just as long
+    def test_burn_rate_follows_a_weight_unit(self):
+        food = Food.objects.create(owner=self.owner, name='Kibble', amount=10, unit=Food.POUND, burn_rate=2, burn_updated_at=self.now)
+
+        food = self.update(food, 160, Food.OUNCE)
+        self.assertAlmostEqual(food.burn_rate, 2 * 453.592 / 28.3495)
+        self.assertAlmostEqual(days_until_empty(food, self.now), 5)
+
+    def test_burn_rate_follows_a_volume_unit_through_density(self):
+        food = Food.objects.create(owner=self.owner, name='Milk', amount=2000, unit=Food.GRAM, burn_rate=500, burn_updated_at=self.now)
+
+        food = self.update(food, 1.6, Food.LITER, density=1.25)
+        self.assertAlmostEqual(food.burn_rate, 0.4)
+        self.assertAlmostEqual(days_until_empty(food, self.now), 4)
+
+    def test_burn_rate_is_kept_when_the_unit_is_kept(self):
+        food = Food.objects.create(owner=self.owner, name='Kibble', amount=10, unit=Food.POUND, burn_rate=2, burn_updated_at=self.now)
+
+        self.assertEqual(self.update(food, 20, Food.POUND).burn_rate, 2)
+
+
+class WeightImportTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create(username='keeper')
+        self.rex = MyAnimal.objects.create(owner=self.owner, name='Rex', species='Dog')
+        self.tom = MyAnimal.objects.create(owner=self.owner, name='Tom', species='Cat')
+        MyAnimal.objects.create(owner=self.owner, name='Twin', species='Cat')
+        MyAnimal.objects.create(owner=self.owner, name='Twin', species='Cat')
+
+    def test_csv_import_skips_bad_rows(self):
+        lines = [
+            'name,weight_lb,weight_oz,notes\n',
+            'Rex,10,4,Vet visit\n',
+            'Tom,,12,\n',
+            'Rex,12,,Heavier\n',
+            ',3,0,\n',
+            'Rex,heavy,0,\n',
+            'Rex,-1,0,\n',
+            'Rex,0,0,\n',
+            'Nobody,1,0,\n',
+            'Twin,1,0,\n',
+        ]
+        result = import_weights(self.owner, lines, 'csv', chunk_size=3)
+
+        self.assertEqual(result['imported'], 3)
+        self.assertEqual(result['failed'], 6)
+        self.assertEqual(result['errors'], [
+            (5, 'Missing the animal name.'),
+            (6, 'Weight inputs must be an integer.'),
+            (7, 'Weight inputs cannot be negative.'),
+            (8, 'Weight cannot be zero.'),
+            (9, 'No animal named Nobody.'),
+            (10, 'More than one animal is named Twin.'),
+        ])
+
+        # The last weigh-in of an animal in the file is its current weight
+        self.assertEqual(list(Log.objects.filter(myanimal=self.rex).order_by('id').values_list('weight_lb', 'weight_oz', 'description')),
+                         [(10, 4, 'Vet visit'), (12, 0, 'Heavier')])
+        self.rex.refresh_from_db()
+        self.tom.refresh_from_db()
+        self.assertEqual((self.rex.weight_lb, self.rex.weight_oz), (12, 0))
+        self.assertEqual((self.tom.weight_lb, self.tom.weight_oz), (0, 12))
+
+    def test_ndjson_import_skips_bad_rows(self):
+        lines = [
+            '{"name": "Rex", "weight_lb": 9, "weight_oz": 2}\n',
+            '\n',
+            'not json\n',
+            '[1, 2]\n',
+            '{"name": "Tom", "weight_lb": "3", "notes": "After dinner"}\n',
+        ]
+        result = import_weights(self.owner, lines, 'ndjson')
+
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual(result['errors'], [(3, 'Not valid JSON.'), (4, 'Expected a JSON object.')])
+        self.assertEqual(Log.objects.get(myanimal=self.tom).description, 'After dinner')
+
+    @override_settings(IMPORT_MAX_ERRORS=2)
+    def test_only_the_first_errors_are_listed(self):
+        result = import_weights(self.owner, ['name,weight_lb\n'] + ['Nobody,1\n'] * 5, 'csv', chunk_size=2)
+        self.assertEqual(result['failed'], 5)
+        self.assertEqual(result['errors'], [(2, 'No animal named Nobody.'), (3, 'No animal named Nobody.')])
+
+    def test_upload_form(self):
+        self.client.force_login(self.owner)
+        upload = SimpleUploadedFile('weights.ndjson', b'{"name": "Rex", "weight_lb": 7}\n{"name": "Nobody", "weight_lb": 1}\n')
+
+        response = self.client.post(reverse('weigh_import'), {'file': upload})
+        self.assertEqual(response.context['result']['imported'], 1)
+        self.assertEqual(response.context['result']['errors'], [(2, 'No animal named Nobody.')])
+        self.assertEqual(MyAnimal.objects.get(id=self.rex.id).weight_lb, 7)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class LogExportTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create(username='keeper')
+        self.client.force_login(self.owner)
+        rex = MyAnimal.objects.create(owner=self.owner, name='Rex', species='Dog')
+        kibble = Food.objects.create(owner=self.owner, name='Kibble', amount=100, unit=Food.GRAM)
+        self.today = timezone.localdate()
+
+        # An archived feeding, two recent feedings a day apart and a weigh-in, plus another user's log
+        self.archived = LogArchive.objects.create(id=1, owner=self.owner, myanimal=rex, food=kibble, log_type=Log.FEEDING, amount_fed=5,
+                                                  unit=Food.GRAM, converted_amount_grams=5, created_at=self.at(400))
+        self.logs = [
+            self.log(myanimal=rex, food=kibble, log_type=Log.FEEDING, amount_fed=10, unit=Food.GRAM, converted_amount_grams=10, days_ago=2),
+            self.log(myanimal=rex, food=kibble, log_type=Log.FEEDING, amount_fed=20, unit=Food.GRAM, converted_amount_grams=20, days_ago=1),
+            self.log(myanimal=rex, log_type=Log.WEIGHT_UPDATE, weight_lb=12, weight_oz=3, description='Vet, "annual"', days_ago=1),
+        ]
+        other = get_user_model().objects.create(username='other')
+        Log.objects.create(owner=other, myanimal=MyAnimal.objects.create(owner=other, name='Tom', species='Cat'), log_type=Log.WEIGHT_UPDATE)
+
+    # Helper function to build local noon some days back
+    def at(self, days_ago):
+        return timezone.make_aware(datetime.combine(self.today - timedelta(days=days_ago), time(12)))
+
+    # Helper function to write a log created some days back
+    def log(self, days_ago, **fields):
+        log = Log.objects.create(owner=self.owner, **fields)
+        Log.objects.filter(id=log.id).update(created_at=self.at(days_ago))
+        return log.id
+
+    # Helper function to download an export, returning the response and its blocks
+    def export(self, **params):
+        response = self.client.get(reverse('log_export'), params)
+        return response, [block.decode() for block in response.streaming_content] if response.streaming else []
+
+    def test_csv_export_streams_every_log_in_order(self):
+        response, blocks = self.export(format='csv')
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="zooventory_logs_', response['Content-Disposition'])
+        rows = list(csv.reader(''.join(blocks).splitlines()))
+        self.assertEqual(rows[0], [column for column, field in EXPORT_COLUMNS])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [self.archived.id] + self.logs)
+        self.assertEqual(rows[-1][3:5], ['Rex', ''])
+        self.assertEqual(rows[-1][-1], 'Vet, "annual"')
+
+        # The header, then the rows two at a time
+        self.assertEqual(len(blocks), 3)
+
+    def test_ndjson_export(self):
+        response, blocks = self.export(format='ndjson')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in ''.join(blocks).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [self.archived.id] + self.logs)
+        self.assertEqual(rows[1]['food'], 'Kibble')
+        self.assertEqual(rows[1]['converted_amount_grams'], 10)
+        self.assertEqual((rows[3]['weight_lb'], rows[3]['weight_oz']), (12, 3))
+
+    # Start and end are local dates and both are included
+    def test_date_and_type_filters(self):
+        day = self.today - timedelta(days=1)
+        response, blocks = self.export(format='ndjson', start=day.isoformat(), end=day.isoformat())
+        self.assertEqual([json.loads(line)['id'] for line in ''.join(blocks).splitlines()], self.logs[1:])
+
+        response, blocks = self.export(format='ndjson', type='feeding')
+        self.assertEqual([json.loads(line)['id'] for line in ''.join(blocks).splitlines()], [self.archived.id] + self.logs[:2])
+
+    def test_invalid_filters_are_rejected(self):
+        for params in ({'format': 'xml'}, {'start': 'yesterday'}, {'type': 'bath'}):
+            response, blocks = self.export(**params)
+            self.assertEqual(response.status_code, 400, params)
+
+    # ASGI servers get the same blocks through the async iterator
+    def test_async_blocks_match(self):
+        async def collect():
+            rows = await sync_to_async(export_rows)(self.owner.id, {})
+            return [block async for block in async_export_blocks(rows, 'csv')]
+
+        self.assertEqual(async_to_sync(collect)(), list(export_blocks(export_rows(self.owner.id, {}), 'csv')))
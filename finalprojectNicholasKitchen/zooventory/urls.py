@@ -37,9 +37,13 @@ urlpatterns = [
 
     # Calculator URLs
     path('calculator/feed/', views.feed_myanimal, name='feed_myanimal'),
+    path('calculator/feed/batch/', views.feed_batch, name='feed_batch'),
     path('calculator/weigh/', views.weigh_myanimal, name='weigh_myanimal'),
+    path('calculator/weigh/import/', views.weigh_import, name='weigh_import'),
+    path('logs/export', views.log_export, name='log_export'),
 
     # Chart URLs
+    path('chart/dashboard', views.chart_dashboard, name='chart_dashboard'),
     path('chart/food-usage', views.chart_food_usage, name='chart_food_usage'),
     path('chart/feeding-frequency', views.chart_feeding_frequency, name='chart_feeding_frequency'),
     path('chart/top-food', views.chart_top_food, name='chart_top_food'),
@@ -49,4 +53,5 @@ urlpatterns = [
     path('notification/', views.notification_index, name='notification_index'),
     path('notification/mark-read/', views.notification_mark_read, name='notification_mark_read'),
     path('notification/<int:id>/mark-read/', views.notification_mark_one, name='notification_mark_one'),
+    path('notification/stream/', views.notification_stream, name='notification_stream'),
 ]
@@ -22,4 +22,16 @@ def convert_to_grams(amount, unit):
 def convert_to_ml(amount, unit):
     if unit in VOLUME_CONVERSION:
         return amount * VOLUME_CONVERSION[unit]
+    return None
+
+# Convert any amount to grams, weighing volumes with a density in g/ml (water when none is given).
+# Return none if unit is unknown
+def convert_to_canonical_grams(amount, unit, density=None):
+    grams = convert_to_grams(amount, unit)
+    if grams is not None:
+        return grams
+
+    ml = convert_to_ml(amount, unit)
+    if ml is not None:
+        return ml * (density or 1.0)
     return None
\ No newline at end of file
@@ -0,0 +1,72 @@
+import numpy as np
+
+# Largest-Triangle-Three-Buckets downsampling for line charts.
+# Keeps the first and last points and, from each bucket in between, the point that makes the largest
+# triangle with the point kept before it and the average of the next bucket, so peaks and dips survive.
+
+# Pick which columns to keep for every row of a series matrix, at most threshold per row.
+# All rows walk the same buckets in lockstep, so the Python loop runs once per bucket, not per point.
+# Returns a rows x threshold array of column indices.
+def lttb_indices(matrix, threshold):
+    rows, count = matrix.shape
+    if threshold >= count:
+        return np.tile(np.arange(count), (rows, 1))
+    if threshold < 3:
+        return np.tile(np.array([0, count - 1][:max(threshold, 0)]), (rows, 1))
+
+    x = np.arange(count, dtype=np.float64)
+    row_index = np.arange(rows)
+    kept = np.empty((rows, threshold), dtype=np.int64)
+    kept[:, 0] = 0
+    kept[:, -1] = count - 1
+    bucket_size = (count - 2) / (threshold - 2)
+
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        # Average of the next bucket, or the last point for the final bucket
+        next_start, next_end = end, min(int((i + 2) * bucket_size) + 1, count)
+        if next_start >= next_end:
+            next_start, next_end = count - 1, count
+        avg_x = x[next_start:next_end].mean()
+        avg_y = matrix[:, next_start:next_end].mean(axis=1)
+
+        # Keep the point with the largest triangle area in this bucket
+        prev_x = kept[:, i].astype(np.float64)
+        prev_y = matrix[row_index, kept[:, i]]
+        area = np.abs(
+            (prev_x - avg_x)[:, None] * (matrix[:, start:end] - prev_y[:, None])
+            - (prev_x[:, None] - x[start:end]) * (avg_y - prev_y)[:, None]
+        )
+        kept[:, i + 1] = start + area.argmax(axis=1)
+
+    return kept
+
+# Downsample a matrix of series that share one list of labels to at most max_points labels
+# (3 per series when there are more series than that allows). Each series gets an equal share of
+# the points, and the labels any series kept are kept for all of them, so the series stay aligned
+# with the labels. Gaps (NaN) before a series' first value are treated as flat while picking.
+def downsample_matrix(labels, matrix, max_points):
+    if len(labels) <= max_points or not len(matrix):
+        return labels, matrix
+
+    # Flatten leading gaps onto the first value so they never win a bucket
+    present = ~np.isnan(matrix)
+    first = np.where(present.any(axis=1), present.argmax(axis=1), 0)
+    filled = np.where(present, matrix, np.nan_to_num(matrix[np.arange(len(matrix)), first])[:, None])
+
+    kept = np.unique(lttb_indices(filled, max(max_points // len(matrix), 3)))
+    return [labels[i] for i in kept], matrix[:, kept]
+
+# Same as downsample_matrix for a dict of series given as lists, with None for gaps
+def downsample(labels, series, max_points):
+    if len(labels) <= max_points or not series:
+        return labels, series
+
+    matrix = np.array([[np.nan if value is None else value for value in values] for values in series.values()], dtype=np.float64)
+    labels, matrix = downsample_matrix(labels, matrix, max_points)
+
+    result = matrix.astype(object)
+    result[np.isnan(matrix)] = None
+    return labels, dict(zip(series, result.tolist()))
@@ -0,0 +1,52 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# Keyset pagination over (created_at, id), newest first.
+# A page is found by seeking past the row its cursor names instead of counting and skipping
+# earlier rows, so every page costs the same however long the history is. The plain created_at
+# bound next to the tie-break is what lets the database seek the index to the cursor.
+
+# Helper function to turn a row position and direction into an opaque URL token
+def encode_cursor(direction, created_at, id):
+    return urlsafe_b64encode(f'{direction}|{created_at.isoformat()}|{id}'.encode()).decode().rstrip('=')
+
+# Helper function to read a token back. Returns None for anything that isn't a valid token.
+def decode_cursor(token):
+    try:
+        direction, created_at, id = urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode().split('|')
+        created_at = parse_datetime(created_at)
+        if direction not in ('next', 'previous') or created_at is None:
+            return None
+        return direction, created_at, int(id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+# Return one page of a queryset with 'object_list' and the 'next' and 'previous' tokens, None when there is no such page.
+# 'next' pages move towards older rows and 'previous' pages towards newer ones.
+def keyset_page(queryset, token, per_page):
+    cursor = decode_cursor(token) if token else None
+
+    if cursor is None:
+        rows = list(queryset.order_by('-created_at', '-id')[:per_page + 1])
+        has_newer, has_older = False, len(rows) > per_page
+        rows = rows[:per_page]
+    elif cursor[0] == 'next':
+        _, created_at, id = cursor
+        older = queryset.filter(Q(created_at__lt=created_at) | Q(id__lt=id), created_at__lte=created_at)
+        rows = list(older.order_by('-created_at', '-id')[:per_page + 1])
+        has_newer, has_older = True, len(rows) > per_page
+        rows = rows[:per_page]
+    else:
+        # Walk upwards from the cursor, then flip the rows back to newest first
+        _, created_at, id = cursor
+        newer = queryset.filter(Q(created_at__gt=created_at) | Q(id__gt=id), created_at__gte=created_at)
+        rows = list(newer.order_by('created_at', 'id')[:per_page + 1])
+        has_newer, has_older = len(rows) > per_page, True
+        rows = rows[:per_page][::-1]
+
+    return {
+        'object_list': rows,
+        'next': encode_cursor('next', rows[-1].created_at, rows[-1].id) if rows and has_older else None,
+        'previous': encode_cursor('previous', rows[0].created_at, rows[0].id) if rows and has_newer else None,
+    }
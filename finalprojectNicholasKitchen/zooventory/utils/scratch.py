@@ -0,0 +1,12 @@
+from contextlib import contextmanager
+from django.db import connection
+
+# Run a block against a throwaway database with the full schema, the same way the test runner does.
+# Used by the benchmark and query plan commands so seeded data never touches the real database.
+@contextmanager
+def scratch_database():
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,47 @@
+import numpy as np
+
+from collections import defaultdict
+
+# Per-name time series for line charts, held as a names x buckets matrix of floats.
+# Gaps are NaN in the matrix and None once the series are turned back into lists.
+
+# Build the matrix from rows of (name, bucket, value) and forward-fill the gaps along each row,
+# all as array operations, so the cost no longer grows with Python loops over names times buckets.
+# Returns the names in order of first appearance and the matrix. Buckets before a name's first value
+# stay NaN. Rows outside the buckets are ignored, and a later row for the same name and bucket wins.
+def forward_filled_matrix(names, buckets, values, all_buckets):
+    # Map each row to its matrix cell. Dict lookups through map() stay in C, unlike np.unique on
+    # strings or dates or a Python loop over the rows.
+    name_index = {name: i for i, name in enumerate(dict.fromkeys(names))}
+    rows = np.fromiter(map(name_index.__getitem__, names), dtype=np.int64, count=len(names))
+    bucket_index = defaultdict(lambda: -1, {bucket: i for i, bucket in enumerate(all_buckets)})
+    cols = np.fromiter(map(bucket_index.__getitem__, buckets), dtype=np.int64, count=len(buckets))
+    values = np.asarray(values, dtype=np.float64)
+
+    inside = cols >= 0
+    matrix = np.full((len(name_index), len(all_buckets)), np.nan)
+    matrix[rows[inside], cols[inside]] = values[inside]
+
+    # Forward-fill: carry the column of the last value seen along each row
+    seen = np.where(np.isnan(matrix), np.int32(0), np.arange(len(all_buckets), dtype=np.int32))
+    np.maximum.accumulate(seen, axis=1, out=seen)
+    return list(name_index), np.take_along_axis(matrix, seen, axis=1)
+
+# Turn the rows of a forward-filled matrix into plain lists, with None for the gaps before each row's first value
+def matrix_to_lists(matrix):
+    present = ~np.isnan(matrix)
+    first = np.where(present.any(axis=1), present.argmax(axis=1), matrix.shape[1]).tolist()
+
+    lists = matrix.tolist()
+    for values, gap in zip(lists, first):
+        values[:gap] = [None] * gap
+    return lists
+
+# Same as forward_filled_matrix, as a dict of lists by name
+def forward_filled_series(names, buckets, values, all_buckets):
+    names, matrix = forward_filled_matrix(names, buckets, values, all_buckets)
+    return dict(zip(names, matrix_to_lists(matrix)))
+
+# Combine pound and ounce columns into pounds, as an array operation
+def weight_in_pounds(weight_lb, weight_oz):
+    return np.nan_to_num(np.asarray(weight_lb, dtype=np.float64)) + np.nan_to_num(np.asarray(weight_oz, dtype=np.float64)) / 16
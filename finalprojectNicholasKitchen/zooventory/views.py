@@ -1,18 +1,39 @@
+import asyncio
+import codecs
+import json
+import math
 import requests
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login, authenticate
-from django.core.paginator import Paginator
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Sum, Q
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Avg, Count, Sum, Q
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.views.decorators.gzip import gzip_page
 from django.conf import settings
-from .models import MyAnimal, UniqueAnimal, Food, FeedingSchedule, Log, Notification
+from .models import MyAnimal, UniqueAnimal, Food, FeedingSchedule, Log, DailyFeedingRollup, Notification
+from .events import hub, publish_read
+from .notifications import invalidate_unread, unread_summary, unread_version
+from .rollups import record_feedings
+from .inventory import StockContention, convert_burn_rate, days_until_empty, take_from_stock
+from .imports import WEIGHT_FORMATS, format_for, import_weights
+from .exports import EXPORT_FORMATS, async_export_blocks, export_blocks, export_filters, export_rows
+from .archive import log_models
+from .charts import bucket_expression, cached_chart, chart_params, invalidate_charts
 from .utils.conversions import *
-from datetime import datetime, timedelta
+from .utils.downsample import downsample, downsample_matrix
+from .utils.pagination import keyset_page
+from .utils.series import forward_filled_matrix, matrix_to_lists, weight_in_pounds
+from scheduler.recurrence import first_occurrence
+from collections import defaultdict
+from datetime import datetime, time
 
 # -----------------------------
 # Fetch request for animal API
@@ -224,6 +245,7 @@ def myanimal_update(request, id):
         myanimal.species = unique_animal.name
         myanimal.age = request.POST.get('age', myanimal.age)
         myanimal.save()
+        invalidate_charts([request.user.id])
         messages.success(request, 'MyAnimal updated successfully!')
         return redirect('myanimal_index')
 
@@ -240,6 +262,7 @@ def myanimal_delete(request, id):
     if request.method == 'POST':
         # Delete the myanimal object
         myanimal.delete()
+        invalidate_charts([request.user.id])
         messages.success(request, 'MyAnimal deleted.')
         return redirect('myanimal_index')
 
@@ -493,10 +516,17 @@ def food_index(request):
     if search:
         food_list = food_list.filter(Q(name__icontains=search))
 
+    # Forecast from the stored burn rates, no logs are read
+    food_list = list(food_list)
+    now = timezone.now()
+    for f in food_list:
+        f.days_until_empty = days_until_empty(f, now)
+
     return render(request, 'zooventory/food/index.html', {
         'food': food_list,
         'sort': sort,
         'search': search,
+        'low_stock_days': settings.FOOD_LOW_STOCK_DAYS,
     })
 
 @login_required
@@ -505,6 +535,7 @@ def food_create(request):
         name = request.POST.get('name')
         amount = request.POST.get('amount')
         unit = request.POST.get('unit')
+        density = request.POST.get('density') or None
 
         # Ensure amount is a number
         try:
@@ -518,9 +549,14 @@ def food_create(request):
             messages.error(request, "Amount must be over 0.")
             return render(request, 'zooventory/food/create.html', { 'unit_choices': Food.UNIT_CHOICES })
 
+        # Ensure density, when given, is a number over 0
+        if density is not None and not _is_positive_number(density):
+            messages.error(request, 'Density must be a number over 0.')
+            return render(request, 'zooventory/food/create.html', { 'unit_choices': Food.UNIT_CHOICES })
+
         # Create the food object if required fields are filled
         if name and amount and unit:
-            Food.objects.create(owner=request.user, name=name, amount=amount, unit=unit)
+            Food.objects.create(owner=request.user, name=name, amount=amount, unit=unit, density=density)
             messages.success(request, 'Food added successfully!')
             return redirect('food_index')
         else:
@@ -545,11 +581,28 @@ def food_update(request, id):
             messages.error(request, "Amount must be over 0.")
             return render(request, 'zooventory/food/update.html', {'food': food, 'unit_choices': Food.UNIT_CHOICES})
 
-        # Save the changes
+        # Ensure density, when given, is a number over 0
+        density = request.POST.get('density', food.density) or None
+        if density is not None and not _is_positive_number(density):
+            messages.error(request, 'Density must be a number over 0.')
+            return render(request, 'zooventory/food/update.html', {'food': food, 'unit_choices': Food.UNIT_CHOICES})
+
+        # Restocking allows another low-stock alert
+        if float(request.POST.get('amount', food.amount)) > (food.amount or 0):
+            food.low_stock_notified = False
+
+        # The burn rate is kept in the food's unit, so a new unit gets the same rate converted to it
+        unit = request.POST.get('unit', food.unit)
+        if unit != food.unit:
+            food.burn_rate = convert_burn_rate(food.burn_rate, food.unit, unit, float(density) if density else None)
+
+        # Save the changes. Past feedings keep the grams they were logged with.
         food.name = request.POST.get('name', food.name)
         food.amount = request.POST.get('amount', food.amount)
-        food.unit = request.POST.get('unit', food.unit)
-        food.save()
+        food.unit = unit
+        food.density = density
+        food.save(update_fields=['name', 'amount', 'unit', 'density', 'burn_rate', 'low_stock_notified'])
+        invalidate_charts([request.user.id])
         messages.success(request, 'Food updated successfully!')
         return redirect('food_index')
 
@@ -562,11 +615,19 @@ def food_delete(request, id):
     if request.method == 'POST':
         # Delete the food object
         food.delete()
+        invalidate_charts([request.user.id])
         messages.success(request, 'Food deleted.')
         return redirect('food_index')
 
     return redirect('food_index')
 
+# Helper function to check a form value is a number over 0
+def _is_positive_number(value):
+    try:
+        return float(value) > 0
+    except (TypeError, ValueError):
+        return False
+
 # -----------------------------
 # Feeding Schedule CRUD
 # -----------------------------
@@ -595,45 +656,16 @@ def feeding_schedule_create(request, id):
         parsed_time = datetime.strptime(time_of_day, '%H:%M').time() if time_of_day else None
         hours_interval = int(hours_interval) if hours_interval else None
 
-        local = timezone.get_current_timezone()
-        now = timezone.now()
-        today = timezone.localdate()
-
-        next_run = now
-
-        # Compute the next_run
-        # Daily
-        if frequency == FeedingSchedule.DAILY and parsed_time:
-            next_run = timezone.make_aware(datetime.combine(today, parsed_time), local)
-            if next_run <= now:
-                next_run += timedelta(days=1)
-
-        # Weekly
-        elif frequency == FeedingSchedule.WEEKLY and parsed_time and day_of_week:
-            today_wd = today.weekday()
-            target = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun'].index(day_of_week)
-
-            days_ahead = (target - today_wd) % 7
-            run_date = today + timedelta(days=days_ahead)
-
-            next_run = timezone.make_aware(datetime.combine(run_date, parsed_time), local)
-            # Push to next week if time is already past
-            if days_ahead == 0 and next_run <= now:
-                next_run += timedelta(days=7)
-
-        # Every X Hours
-        elif frequency == FeedingSchedule.EVERY_X_HOURS and hours_interval:
-            next_run = now + timedelta(hours=hours_interval)
-
-        # Create the feeding schedule
-        FeedingSchedule.objects.create(
+        # Compute the next_run with the scheduler's recurrence rules, then create the feeding schedule
+        schedule = FeedingSchedule(
             myanimal=myanimal,
             frequency=frequency,
             time_of_day=parsed_time,
             hours_interval=hours_interval,
             day_of_week=day_of_week,
-            next_run=next_run,
         )
+        schedule.next_run = first_occurrence(schedule, timezone.now())
+        schedule.save()
 
         messages.success(request, 'Feeding schedule created successfully!')
         return redirect('feeding_schedule_index', id=id)
@@ -683,9 +715,10 @@ def feed_myanimal(request):
         food = get_object_or_404(Food, id=food_id, owner=request.user)
         food_unit = food.unit
 
-        # Verify amount is a float
+        # Verify amount is a float, and a finite one
         try:
-            float(amount)
+            if not math.isfinite(float(amount)):
+                raise ValueError
         except ValueError:
             messages.error(request, 'Amount must be a number.')
             return render(request, 'zooventory/calculator/feed.html', {
@@ -703,35 +736,42 @@ def feed_myanimal(request):
 
         amount = float(amount)
 
-        # Ensure food amount is more than 0
-        if food.amount > 0:
-            # Only subtract if there is enough food in inventory
-            if food.amount >= amount:
-                food.amount -= amount
-                food.save()
-
-                converted_grams = convert_to_grams(amount, food_unit)
-                converted_ml = convert_to_ml(amount, food_unit)
-
-                myanimal.last_fed = timezone.now()
-                myanimal.save()
-
-                Log.objects.create(
-                    owner=request.user,
-                    myanimal=myanimal,
-                    food=food,
-                    amount_fed=amount,
-                    unit=food_unit,
-                    converted_amount_grams=converted_grams,
-                    converted_amount_ml=converted_ml,
-                    log_type=Log.FEEDING,
-                    description=notes
-                )
-                messages.success(request, f'{myanimal.name} has been fed!')
-            else:
-                messages.error(request, 'Not enough food to feed animal!')
+        converted_grams = convert_to_grams(amount, food_unit)
+        converted_ml = convert_to_ml(amount, food_unit)
+        canonical_grams = convert_to_canonical_grams(amount, food_unit, food.density)
+
+        # Inventory, animal, log and daily rollup change together or not at all.
+        # Stock is taken with a conditional UPDATE, so parallel feedings can't overdraw it or lose a decrement.
+        try:
+            with transaction.atomic():
+                fed = take_from_stock(food, amount)
+                if fed:
+                    myanimal.last_fed = timezone.now()
+                    myanimal.save(update_fields=['last_fed'])
+
+                    log = Log.objects.create(
+                        owner=request.user,
+                        myanimal=myanimal,
+                        food=food,
+                        amount_fed=amount,
+                        unit=food_unit,
+                        converted_amount_grams=converted_grams,
+                        converted_amount_ml=converted_ml,
+                        canonical_grams=canonical_grams,
+                        log_type=Log.FEEDING,
+                        description=notes
+                    )
+                    record_feedings([log])
+        except StockContention as e:
+            # The stock is there, but other feedings kept getting to it first
+            messages.error(request, f'{e}. Please try again.')
+            return redirect('feed_myanimal')
+
+        if fed:
+            invalidate_charts([request.user.id])
+            messages.success(request, f'{myanimal.name} has been fed!')
         else:
-            messages.error(request, 'Food amount cannot be negative!')
+            messages.error(request, 'Not enough food to feed animal!')
 
         return redirect('feed_myanimal')
 
@@ -741,6 +781,113 @@ def feed_myanimal(request):
         'food': food_items,
     })
 
+@login_required
+def feed_batch(request):
+    # One row per animal the user owns, each with its own food and amount
+    myanimals = list(MyAnimal.objects.filter(owner=request.user).order_by('name'))
+    food_items = list(Food.objects.filter(owner=request.user).order_by('name'))
+    rows = [{'myanimal': myanimal, 'food_id': '', 'amount': '', 'notes': ''} for myanimal in myanimals]
+
+    if request.method == 'POST':
+        entries = list(zip(
+            request.POST.getlist('myanimal_id'),
+            request.POST.getlist('food_id'),
+            request.POST.getlist('amount'),
+            request.POST.getlist('notes'),
+        ))
+
+        # Keep what was entered in case the round has to be shown again
+        entered = {myanimal_id: (food_id, amount, notes) for myanimal_id, food_id, amount, notes in entries}
+        for row in rows:
+            row['food_id'], row['amount'], row['notes'] = entered.get(str(row['myanimal'].id), ('', '', ''))
+
+        # Validate every row before anything is written, skipping rows left blank
+        myanimals_by_id = {str(myanimal.id): myanimal for myanimal in myanimals}
+        food_by_id = {str(food.id): food for food in food_items}
+        errors = []
+        feedings = []
+        totals = defaultdict(float)
+        for myanimal_id, food_id, amount, notes in entries:
+            if not food_id and not amount:
+                continue
+
+            myanimal = myanimals_by_id.get(myanimal_id)
+            food = food_by_id.get(food_id)
+            if myanimal is None:
+                errors.append('One of the animals could not be found.')
+                continue
+            if food is None:
+                errors.append(f'Choose a food for {myanimal.name}.')
+                continue
+            try:
+                amount = float(amount)
+                if not math.isfinite(amount):
+                    raise ValueError
+            except ValueError:
+                errors.append(f'Amount for {myanimal.name} must be a number.')
+                continue
+            if amount <= 0:
+                errors.append(f'Amount for {myanimal.name} must be over 0.')
+                continue
+
+            feedings.append((myanimal, food, amount, notes))
+            totals[food] += amount
+
+        # Check the whole round against the stock, one food at a time
+        for food, total in totals.items():
+            if (food.amount or 0) < total:
+                errors.append(f'Not enough {food.name} for this round ({total:g} {food.unit} needed, {food.amount or 0:g} left).')
+
+        if not feedings and not errors:
+            errors.append('Enter an amount for at least one animal.')
+
+        if errors:
+            for error in errors:
+                messages.error(request, error)
+            return render(request, 'zooventory/calculator/feed_batch.html', {'rows': rows, 'food': food_items})
+
+        # Take each food's stock once for the whole round, then write every log, last_fed and rollup together
+        try:
+            with transaction.atomic():
+                short = [food for food, total in totals.items() if not take_from_stock(food, total)]
+                if short:
+                    transaction.set_rollback(True)
+                else:
+                    logs = Log.objects.bulk_create([
+                        Log(
+                            owner=request.user,
+                            myanimal=myanimal,
+                            food=food,
+                            amount_fed=amount,
+                            unit=food.unit,
+                            converted_amount_grams=convert_to_grams(amount, food.unit),
+                            converted_amount_ml=convert_to_ml(amount, food.unit),
+                            canonical_grams=convert_to_canonical_grams(amount, food.unit, food.density),
+                            log_type=Log.FEEDING,
+                            description=notes,
+                        )
+                        for myanimal, food, amount, notes in feedings
+                    ])
+                    MyAnimal.objects.filter(id__in={myanimal.id for myanimal, food, amount, notes in feedings}).update(last_fed=timezone.now())
+                    record_feedings(logs)
+        except StockContention as e:
+            # Nothing was written, so the round can just be sent again
+            messages.error(request, f'{e}. Please try again.')
+            food_items = list(Food.objects.filter(owner=request.user).order_by('name'))
+            return render(request, 'zooventory/calculator/feed_batch.html', {'rows': rows, 'food': food_items})
+
+        # Another keeper fed from the same stock since the page was loaded
+        if short:
+            messages.error(request, f"Not enough {', '.join(food.name for food in short)} left for this round.")
+            food_items = list(Food.objects.filter(owner=request.user).order_by('name'))
+            return render(request, 'zooventory/calculator/feed_batch.html', {'rows': rows, 'food': food_items})
+
+        invalidate_charts([request.user.id])
+        messages.success(request, f'Fed {len(feedings)} animals!')
+        return redirect('feed_batch')
+
+    return render(request, 'zooventory/calculator/feed_batch.html', {'rows': rows, 'food': food_items})
+
 @login_required
 def weigh_myanimal(request):
     myanimals = MyAnimal.objects.filter(owner=request.user)
@@ -776,186 +923,321 @@ def weigh_myanimal(request):
         myanimal.weight_oz = weight_oz
         myanimal.save()
         Log.objects.create(owner=request.user, myanimal=myanimal, log_type=Log.WEIGHT_UPDATE, description=notes, weight_lb=weight_lb, weight_oz=weight_oz)
+        invalidate_charts([request.user.id])
         messages.success(request, 'Weight updated successfully!')
         return redirect('weigh_myanimal')
 
     return render(request, 'zooventory/calculator/weigh.html', {'myanimals': myanimals})
 
+@login_required
+def weigh_import(request):
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if upload is None:
+            messages.error(request, 'Choose a CSV or NDJSON file to import.')
+            return render(request, 'zooventory/calculator/weigh_import.html')
+
+        format = request.POST.get('format') or format_for(upload.name)
+        if format not in WEIGHT_FORMATS:
+            messages.error(request, 'Format must be CSV or NDJSON.')
+            return render(request, 'zooventory/calculator/weigh_import.html')
+
+        # Read the upload line by line rather than all at once
+        try:
+            result = import_weights(request.user, codecs.iterdecode(upload, 'utf-8-sig'), format)
+        except UnicodeDecodeError:
+            messages.error(request, 'The file must be UTF-8 text. Rows before the bad text were imported.')
+            return render(request, 'zooventory/calculator/weigh_import.html')
+
+        if result['imported']:
+            messages.success(request, f"Imported {result['imported']} weigh-ins.")
+        if result['failed']:
+            messages.error(request, f"{result['failed']} rows were skipped.")
+        return render(request, 'zooventory/calculator/weigh_import.html', {'result': result})
+
+    return render(request, 'zooventory/calculator/weigh_import.html')
+
+# -----------------------------
+# Log export
+# -----------------------------
+
+@login_required
+def log_export(request):
+    format = request.GET.get('format', 'csv')
+    try:
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        filters = export_filters(request.GET.get('start'), request.GET.get('end'), request.GET.getlist('type'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # Stream the rows as they are read. ASGI servers need an async iterator to do the same.
+    rows = export_rows(request.user.id, filters)
+    blocks = async_export_blocks(rows, format) if isinstance(request, ASGIRequest) else export_blocks(rows, format)
+    response = StreamingHttpResponse(blocks, content_type='text/csv' if format == 'csv' else 'application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="zooventory_logs_{timezone.localdate():%Y%m%d}.{format}"'
+    return response
+
 # -----------------------------
 # Charts:
+# - Dashboard (all charts at once)
 # - Food Usage
 # - Feeding Frequency
 # - Top Food
 # - Weight Trends
 # -----------------------------
 
+@gzip_page
 @login_required
-def chart_food_usage(request):
-    # Variables to display food usage over last 30 days, including today
-    today = timezone.now().date()
-    start_date = today - timedelta(days=29)
-    date_list = [start_date + timedelta(days=i) for i in range(30)]
-
-    # Get all FEEDING logs in the date range and group by date.
-    logs = (
-        Log.objects.filter(owner=request.user, log_type=Log.FEEDING, created_at__gte=start_date)
-        .values('created_at__date')
-        .annotate(
-            total_grams=Sum('converted_amount_grams'),
-            total_ml=Sum('converted_amount_ml')
-        )
-        .order_by('created_at__date')
-    )
-
-    # Data arrays for the chart
-    labels = []
-    data_grams = []
-    data_ml = []
-
-    # Convert the 'logs' results into a lookup by date
-    log_map = {entry['created_at__date']: entry for entry in logs}
-
-    # Fill the data for each date in the range
-    for date in date_list:
-        labels.append(date.strftime('%Y-%m-%d'))
-
-        entry = log_map.get(date, None)
-        data_grams.append(entry['total_grams'] if entry else 0)
-        data_ml.append(entry['total_ml'] if entry else 0)
-
-    return JsonResponse({'labels': labels, 'data_grams': data_grams, 'data_ml': data_ml})
+@chart_params
+@cached_chart
+def chart_dashboard(request, window):
+    # Build the food usage and feeding frequency charts from one pass over the rollups
+    rows = _feeding_rollup_rows(request.user, window)
+
+    return JsonResponse({
+        'food_usage': _food_usage_series(rows, window),
+        'feeding_frequency': _feeding_frequency_series(rows),
+        'top_food': _top_food_series(request.user, window),
+        'weight_trends': _weight_trends_series(request.user, window),
+    })
 
+@gzip_page
 @login_required
-def chart_feeding_frequency(request):
-    # Variables for the last 30 days
-    today = timezone.now().date()
-    start_date = today - timedelta(days=29)
-
-    # Get all feeding frequencies for each animal by name within the date range
-    logs = (
-        Log.objects.filter(owner=request.user, log_type=Log.FEEDING, created_at__gte=start_date)
-        .values('myanimal__name')
-        .annotate(count=Sum(1))
-        .order_by('myanimal__name')
-    )
+@chart_params
+@cached_chart
+def chart_food_usage(request, window):
+    return JsonResponse(_food_usage_series(_feeding_rollup_rows(request.user, window), window))
 
-    # Data arrays for the chart
-    labels = [entry['myanimal__name'] for entry in logs]
-    data = [entry['count'] for entry in logs]
+@gzip_page
+@login_required
+@chart_params
+@cached_chart
+def chart_feeding_frequency(request, window):
+    return JsonResponse(_feeding_frequency_series(_feeding_rollup_rows(request.user, window)))
 
-    return JsonResponse({'labels': labels, 'data': data})
+@gzip_page
+@login_required
+@chart_params
+@cached_chart
+def chart_top_food(request, window):
+    return JsonResponse(_top_food_series(request.user, window))
 
+@gzip_page
 @login_required
-def chart_top_food(request):
-    # Variables for the last 30 days
-    today = timezone.now().date()
-    start_date = today - timedelta(days=29)
-
-    # Get all the food consumed for each name
-    logs = (
-        Log.objects.filter(owner=request.user, log_type=Log.FEEDING, created_at__gte=start_date)
-        .values('food__name')
+@chart_params
+@cached_chart
+def chart_weight_trends(request, window):
+    return JsonResponse(_weight_trends_series(request.user, window))
+
+# Helper function to load the feeding rollups in the window, summed per bucket and animal name.
+# The food usage and feeding frequency charts are both built from these rows.
+def _feeding_rollup_rows(owner, window):
+    return list(
+        DailyFeedingRollup.objects.filter(owner=owner, day__gte=window['start_date'])
+        .annotate(bucket=bucket_expression('day', window['bucket']))
+        .values('bucket', 'myanimal__name')
         .annotate(
-            grams=Sum('converted_amount_grams'),
-            ml=Sum('converted_amount_ml')
+            total_grams=Sum('total_grams'),
+            total_ml=Sum('total_ml'),
+            feed_count=Sum('feed_count')
         )
+        .order_by()
     )
 
-    # Create the list of each food and their amount used
-    food_list = []
-    for entry in logs:
-        amount = entry['grams'] if entry['grams'] is not None else entry['ml']
-        food_list.append({
-            'name': entry['food__name'],
-            'amount': amount or 0,
-        })
-
-    # Only take the top 5 food based on amount
-    top_foods = sorted(food_list, key=lambda food: food['amount'], reverse=True)[:5]
+# Grams and milliliters used per bucket
+def _food_usage_series(rows, window):
+    # Sum the rows into a lookup by bucket
+    totals = {}
+    for entry in rows:
+        grams, ml = totals.get(entry['bucket'], (0, 0))
+        totals[entry['bucket']] = (grams + entry['total_grams'], ml + entry['total_ml'])
+
+    # Data arrays for the chart, filling the data for each bucket in the range
+    labels = [date.strftime('%Y-%m-%d') for date in window['buckets']]
+    series = {
+        'data_grams': [totals.get(date, (0, 0))[0] for date in window['buckets']],
+        'data_ml': [totals.get(date, (0, 0))[1] for date in window['buckets']],
+    }
+
+    # Long ranges are thinned out to a bounded number of points
+    labels, series = downsample(labels, series, settings.CHART_MAX_POINTS)
+    return {'labels': labels, **series}
+
+# Number of feedings for each animal by name
+def _feeding_frequency_series(rows):
+    counts = {}
+    for entry in rows:
+        counts[entry['myanimal__name']] = counts.get(entry['myanimal__name'], 0) + entry['feed_count']
+
+    # Data arrays for the chart, sorted by animal name
+    labels = sorted(counts)
+    data = [counts[name] for name in labels]
+
+    return {'labels': labels, 'data': data}
+
+# The foods with the most consumed, by weight with liquids weighed by their density.
+# Ranked and limited to the requested number in the database.
+def _top_food_series(owner, window):
+    top_foods = (
+        DailyFeedingRollup.objects.filter(owner=owner, day__gte=window['start_date'])
+        .values('food__name')
+        .annotate(amount=Sum('total_canonical_grams'))
+        .order_by('-amount', 'food__name')[:window['top']]
+    )
 
     # Use top foods in the response
-    labels = [entry['name'] for entry in top_foods]
+    labels = [entry['food__name'] for entry in top_foods]
     data = [entry['amount'] for entry in top_foods]
 
-    return JsonResponse({'labels': labels, 'data': data})
-
-@login_required
-def chart_weight_trends(request):
-    # Variables for the last 30 days
-    today = timezone.now().date()
-    start_date = today - timedelta(days=29)
-    date_list = [start_date + timedelta(days=i) for i in range(30)]
-    labels = [d.strftime('%Y-%m-%d') for d in date_list]
-
-    # Get logs with WEIGHT_UPDATE
-    logs = (
-        Log.objects.filter(owner=request.user, log_type=Log.WEIGHT_UPDATE, created_at__date__gte=start_date)
-        .values('myanimal__name', 'created_at__date', 'weight_lb', 'weight_oz')
-        .order_by('myanimal__name', 'created_at__date')
-    )
-
-    # Prepare data object for the chart
-    data = {}
-
-    for entry in logs:
-        name = entry['myanimal__name']
-
-        # Convert lb and oz into a single weight value
-        lb = entry['weight_lb'] or 0
-        oz = entry['weight_oz'] or 0
-        weight = lb + (oz/16)
-
-        # Initialize 30-day list for each animal
-        if name not in data:
-            data[name] = [None] * 30
-
-        # Determine which day this log represents
-        date_obj = entry['created_at__date']
-        index = (date_obj - start_date).days
-
-        # Store the weight if inside the range
-        if 0 <= index < 30:
-            data[name][index] = weight
-
-    # Fill missing days so the line chart doesn't break
-    for name, values in data.items():
-        last_value = None
-        for i in range(30):
-            if values[i] is None:
-                values[i] = last_value
-            else:
-                last_value = values[i]
-
-    return JsonResponse({'labels': labels, 'data': data})
+    return {'labels': labels, 'data': data}
+
+# Average weight of each animal by name per bucket, carried forward over buckets without a weigh-in
+def _weight_trends_series(owner, window):
+    labels = [d.strftime('%Y-%m-%d') for d in window['buckets']]
+
+    # Average the WEIGHT_UPDATE logs of each animal per bucket in the database, in the archive too
+    # when the range reaches past the archive horizon. The range starts at local midnight as a plain
+    # created_at bound, so the owner, type and created_at index can be used.
+    start = timezone.make_aware(datetime.combine(window['start_date'], time.min))
+    models = log_models(window['start_date'])
+    logs = []
+    for model in models:
+        logs += (
+            model.objects.filter(owner=owner, log_type=Log.WEIGHT_UPDATE, created_at__gte=start)
+            .annotate(bucket=bucket_expression('created_at', window['bucket'], is_datetime=True))
+            .values('myanimal__name', 'bucket')
+            .annotate(lb=Avg(Coalesce('weight_lb', 0)), oz=Avg(Coalesce('weight_oz', 0)), count=Count('id'))
+            .values_list('myanimal__name', 'bucket', 'lb', 'oz', 'count')
+            .order_by()
+        )
+    if len(models) > 1:
+        logs = _combine_averages(logs)
+
+    # Convert lb and oz into a single weight value and fill missing buckets so the line chart doesn't break
+    names, buckets, lb, oz, counts = zip(*logs) if logs else ((), (), (), (), ())
+    names, matrix = forward_filled_matrix(names, buckets, weight_in_pounds(lb, oz), window['buckets'])
+
+    # Long ranges are thinned out to a bounded number of points before the series become lists
+    labels, matrix = downsample_matrix(labels, matrix, settings.CHART_MAX_POINTS)
+    return {'labels': labels, 'data': dict(zip(names, matrix_to_lists(matrix)))}
+
+# Helper function to merge per-bucket averages from the archive and the Log table. Only the bucket the
+# archive horizon falls in can appear in both, and its averages are weighted by their counts.
+def _combine_averages(rows):
+    combined = {}
+    for name, bucket, lb, oz, count in rows:
+        if (name, bucket) in combined:
+            _, _, first_lb, first_oz, first_count = combined[name, bucket]
+            total = first_count + count
+            lb = (first_lb * first_count + lb * count) / total
+            oz = (first_oz * first_count + oz * count) / total
+            count = total
+        combined[name, bucket] = (name, bucket, lb, oz, count)
+    return list(combined.values())
 
 # -----------------------------
 # Notification:
 # - Index to View All
 # - Mark As Read
+# - Live Stream
 # -----------------------------
 
 @login_required
 def notification_index(request):
-    # Filter all the notifications for the current user and show newest first
-    notifications = Notification.objects.filter(owner=request.user).order_by('-created_at')
+    # Filter all the notifications for the current user, or only the unread ones
+    unread_only = request.GET.get('unread') == '1'
+    notifications = Notification.objects.filter(owner=request.user)
+    if unread_only:
+        notifications = notifications.filter(is_read=False)
 
-    # Set max notifications per page
-    paginator = Paginator(notifications, 10)
+    # Show newest first, 10 per page, seeking from the cursor instead of counting pages
+    page = keyset_page(notifications, request.GET.get('cursor'), 10)
 
-    # Get the current page number and object
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    return render(request, 'zooventory/notification/index.html', {'page_obj': page_obj})
+    return render(request, 'zooventory/notification/index.html', {'page': page, 'unread_only': unread_only})
 
 @login_required
 def notification_mark_read(request):
     # Filter all notifications for current user and update them to being read
     Notification.objects.filter(owner=request.user, is_read=False).update(is_read=True)
+    invalidate_unread([request.user.id])
+    publish_read(request.user.id)
     return redirect('notification_index')
 
 @login_required
 def notification_mark_one(request, id):
     # Filter for the selected notification and update it to being read
-    Notification.objects.filter(owner=request.user, id=id).update(is_read=True)
-    return redirect('notification_index')
\ No newline at end of file
+    if Notification.objects.filter(owner=request.user, id=id, is_read=False).update(is_read=True):
+        invalidate_unread([request.user.id])
+        publish_read(request.user.id)
+    return redirect('notification_index')
+
+async def notification_stream(request):
+    # Server-sent events need an ASGI server. Under WSGI the stream would tie up a worker thread,
+    # and 204 tells the browser not to reconnect.
+    user = await request.auser()
+    if not user.is_authenticated or not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(_notification_events(user.id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# Helper function to format one server-sent event
+def _sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+# Push new notifications and the unread count to one open stream.
+# Events published in this process wake the stream straight away. Notifications written by a scheduler
+# running in another process are picked up by polling the user's unread version in the shared cache,
+# then sending every recent unread notification the stream hasn't shown yet.
+async def _notification_events(owner_id):
+    queue = hub.subscribe(owner_id)
+    try:
+        version = await sync_to_async(unread_version)(owner_id)
+        summary = await sync_to_async(unread_summary)(owner_id)
+        shown = [_stream_notification(notification) for notification in summary['recent']]
+        yield _sse('unread', {'count': summary['count']})
+
+        idle = 0
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.NOTIFICATION_STREAM_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                event = None
+
+            current = await sync_to_async(unread_version)(owner_id)
+            if event is None and current == version:
+                # Comment lines keep proxies from closing an idle connection
+                idle += settings.NOTIFICATION_STREAM_POLL_SECONDS
+                if idle >= settings.NOTIFICATION_STREAM_KEEPALIVE_SECONDS:
+                    idle = 0
+                    yield ': keepalive\n\n'
+                continue
+            idle = 0
+            version = current
+
+            if event and event['type'] == 'notification':
+                yield _sse('notification', event['notification'])
+                shown.append(event['notification'])
+
+            # The summary comes from the cache, so it only costs a query right after it changed
+            summary = await sync_to_async(unread_summary)(owner_id)
+            recent = [_stream_notification(notification) for notification in summary['recent']]
+            for notification in reversed(recent):
+                if notification not in shown:
+                    yield _sse('notification', notification)
+            shown = recent
+            yield _sse('unread', {'count': summary['count']})
+    finally:
+        hub.unsubscribe(owner_id, queue)
+
+# Helper function to shape a cached unread notification like the ones the scheduler publishes
+def _stream_notification(notification):
+    return {
+        'id': notification['id'],
+        'message': notification['message'],
+        'occurrences': notification['occurrences'],
+        'created_at': notification['created_at'].isoformat(),
+    }
\ No newline at end of file